@@ -3,67 +3,844 @@ Module that contains the command line app.
 
 Typical usage example from command line:
         python cli.py --upload
+        python cli.py --prepare --upload-part-size-mb 64 --upload-concurrency 16
+        python cli.py --prepare --force
+        python cli.py --prepare --stream-extract
+        python cli.py --prepare --model-sha256 <sha256 of the release zip>
+        python cli.py --prepare --compression pigz --compression-level 6
+        python cli.py --bench-package
+        python cli.py --prepare --optimize --jit-compile
+        python cli.py --bench-optimize
+        python cli.py --prepare --quantize
+        python cli.py --bench-quantize
         python cli.py --deploy
+        python cli.py --deploy --min-instances 1 --max-instances 4
+        python cli.py --autoscale --max-instances 8 --target-invocations 200
+        python cli.py --deploy --mode serverless --serverless-memory-mb 4096
+        python cli.py --deploy --mode async --max-instances 4
+        python cli.py --score data --output scores.jsonl --async-timeout 3600
+        python cli.py --update --traffic-routing canary --canary-percent 10
+        python cli.py --update --traffic-routing linear --linear-step-percent 25
+        python cli.py --prepare --multi-model cheese-v2
+        python cli.py --deploy --multi-model cheese-v2
+        python cli.py --predict --target-model cheese-v1
+        python cli.py --model-latency
+        python cli.py --rightsize ml.c5.xlarge ml.m5.xlarge --target-p99-ms 200
+        python cli.py --rightsize ml.c5.large ml.c5.xlarge --rightsize-local
         python cli.py --predict
+        python cli.py --predict --payload-format npy
+        python cli.py --predict --payload-format jpeg
+        python cli.py --predict --num-images 0 --batch-size 16
+        python cli.py --predict --num-images 0 --concurrency 8
+        python cli.py --predict --backend local
+        python cli.py --prepare --tflite
+        python cli.py --predict --backend tflite --tflite-threads 4
+        python cli.py --bench-tflite
+        python cli.py --prepare --onnx
+        python cli.py --score data --backend onnx --onnx-threads 8 --output scores.jsonl
+        python cli.py --bench-onnx
+        python cli.py --score s3://bucket/images/ --output scores.jsonl
+        python cli.py --transform s3://bucket/images/ --output scores.jsonl
+        python cli.py --transform data --backend local --output scores.jsonl
+        python cli.py --bench --concurrency 8 --duration 60
+        python cli.py --bench --rps 20 --concurrency 32 --payload-format jpeg
+        python cli.py --bench-payload
+        python cli.py --bench-preprocess
+        python cli.py --bench-imports
+        python cli.py --bench-invoke --payload-format npy
         python cli.py --delete
 """
 
 import os
-import requests
+import io
+import base64
+import zlib
+import struct
+import hashlib
+import threading
 import zipfile
 import tarfile
+import shutil
+import subprocess
+import tempfile
 import argparse
-from glob import glob
-import numpy as np
+import math
+import re
+import sys
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
 import json
+import time
 import boto3
-import sagemaker
-from sagemaker.tensorflow import TensorFlowModel
-from sagemaker import get_execution_role
-from sagemaker.serializers import JSONSerializer
-from sagemaker.deserializers import JSONDeserializer
-import tensorflow as tf
 from datetime import datetime
-from PIL import Image
+from loadtest import run_load_test
+from gzip_parallel import ParallelGzipWriter
+from boto3.s3.transfer import TransferConfig
+from s3transfer.utils import ChunksizeAdjuster
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
-AWS_REGION = os.environ.get("AWS_REGION", "us-east-1")
-S3_MODELS_BUCKET_NAME = os.environ["S3_MODELS_BUCKET_NAME"]
-BEST_MODEL = "model-mobilenetv2_train_base_True.v1"
+# TensorFlow, sagemaker, numpy, Pillow and requests are imported by the
+# functions that use them, so commands that don't need them start fast.
+# The predict and delete paths live in client.py.
+from client import (
+    AWS_REGION,
+    S3_MODELS_BUCKET_NAME,
+    BEST_MODEL,
+    LOCAL_MODEL_PATH,
+    LOCAL_TFLITE_PATH,
+    LOCAL_ONNX_PATH,
+    data_details,
+    MAX_PAYLOAD_BYTES,
+    INVOKE_TIMEOUT_SECONDS,
+    ASYNC_TIMEOUT_SECONDS,
+    PAYLOAD_FORMATS,
+    PAYLOAD_CONTENT_TYPES,
+    IMAGE_EXTENSIONS,
+    sample_image_files,
+    load_instance,
+    new_batch,
+    build_payload,
+    estimate_payload_bytes,
+    make_batches,
+    parse_predictions,
+    make_runtime_client,
+    make_predictor,
+    EndpointPredictor,
+    TargetModelPredictor,
+    ordered_map,
+    LocalPredictor,
+    TFLitePredictor,
+    ONNXPredictor,
+    make_tflite_interpreter,
+    run_tflite,
+    make_backend_predictor,
+    cap_payload_bytes,
+    load_endpoint_config,
+    predict,
+    remove_autoscaling,
+    delete,
+)
+
 ARTIFACT_URI = f"s3://{S3_MODELS_BUCKET_NAME}/{BEST_MODEL}"
 SAGEMAKER_ROLE = os.environ.get("SAGEMAKER_ROLE", "")
+# Unoptimized export kept by --prepare --optimize for comparison
+RAW_MODEL_PATH = f"./artifacts/{BEST_MODEL}/raw/1"
+# Post-training quantized TFLite variants written by --prepare --quantize
+QUANTIZED_MODEL_DIR = f"./artifacts/{BEST_MODEL}/quantized"
+MODEL_RELEASE_URL = "https://github.com/dlops-io/model-deployment-aws/releases/download/v1.0/mobilenetv2_train_base_True.zip"
+# Expected sha256 of the release archive. Every download of it, fresh or
+# resumed, is checked before it is extracted. Without a pin, the digest of
+# the first download is recorded in the manifest and later downloads must
+# match it.
+MODEL_RELEASE_SHA256 = os.environ.get("MODEL_RELEASE_SHA256")
+# Bump when export_model() changes so cached exports are rebuilt
+EXPORT_VERSION = 2
+
+# Multi-model endpoints serve every <name>.tar.gz under this prefix
+MULTI_MODEL_PREFIX = f"s3://{S3_MODELS_BUCKET_NAME}/multi-model/"
+
+# Endpoint types created by --deploy --mode
+DEPLOY_MODES = ("realtime", "serverless", "async")
+# Async requests and responses are staged in S3 next to the model artifact
+ASYNC_INPUT_PREFIX = f"s3://{S3_MODELS_BUCKET_NAME}/{BEST_MODEL}/async-input"
+ASYNC_OUTPUT_PATH = f"s3://{S3_MODELS_BUCKET_NAME}/{BEST_MODEL}/async-output"
+
+# Batch Transform sends each image file as is, see serving/inference.py
+TRANSFORM_CONTENT_TYPE = "application/x-image"
+TRANSFORM_OUTPUT_PREFIX = f"s3://{S3_MODELS_BUCKET_NAME}/{BEST_MODEL}/transform-output"
 
-data_details = {
-    "image_width": 224,
-    "image_height": 224,
-    "num_channels": 3,
-    "num_classes": 4,
-    "label2index": {"parmigiano": 0, "gruyere": 1, "brie": 2, "gouda": 3},
-    "index2label": {"0": "parmigiano", "1": "gruyere", "2": "brie", "3": "gouda"},
+# Blue/green traffic shifting of --update, see update()
+TRAFFIC_ROUTING_TYPES = {"canary": "CANARY", "linear": "LINEAR", "all-at-once": "ALL_AT_ONCE"}
+
+DEFAULT_INSTANCE_TYPE = "ml.m5.xlarge"
+# vCPUs, memory and approximate on-demand real-time inference price in
+# us-east-1 (USD per hour). Override prices with --prices prices.json.
+INSTANCE_TYPES = {
+    "ml.t2.medium": {"vcpus": 2, "memory_gb": 4, "price_per_hour": 0.056},
+    "ml.c5.large": {"vcpus": 2, "memory_gb": 4, "price_per_hour": 0.102},
+    "ml.c5.xlarge": {"vcpus": 4, "memory_gb": 8, "price_per_hour": 0.204},
+    "ml.c5.2xlarge": {"vcpus": 8, "memory_gb": 16, "price_per_hour": 0.408},
+    "ml.c5.4xlarge": {"vcpus": 16, "memory_gb": 32, "price_per_hour": 0.816},
+    "ml.m5.large": {"vcpus": 2, "memory_gb": 8, "price_per_hour": 0.115},
+    "ml.m5.xlarge": {"vcpus": 4, "memory_gb": 16, "price_per_hour": 0.23},
+    "ml.m5.2xlarge": {"vcpus": 8, "memory_gb": 32, "price_per_hour": 0.461},
+    "ml.m5.4xlarge": {"vcpus": 16, "memory_gb": 64, "price_per_hour": 0.922},
 }
 
 
-def download_file(packet_url, base_path="", extract=False, headers=None):
+def fetch_range(packet_url, part_path, segment, headers=None, on_progress=None):
+    # Download bytes segment[0] + segment[2] .. segment[1] into part_path at
+    # the same offset. segment[2] counts the bytes already written, so a
+    # retried or resumed call continues where the last one stopped.
+    import requests
+
+    start, end, _ = segment
+    offset = start + segment[2]
+    if offset > end:
+        return
+    range_headers = dict(headers or {})
+    range_headers["Range"] = f"bytes={offset}-{end}"
+    with requests.get(
+        packet_url, stream=True, headers=range_headers, timeout=(10, 60)
+    ) as r:
+        r.raise_for_status()
+        if r.status_code != 206:
+            raise RuntimeError(f"Server ignored the Range header for {packet_url}")
+        with open(part_path, "r+b") as f:
+            f.seek(offset)
+            # Grow the read size while chunks keep arriving quickly
+            chunk_size = 256 * 1024
+            while True:
+                chunk_start = time.time()
+                chunk = r.raw.read(chunk_size, decode_content=True)
+                if not chunk:
+                    break
+                f.write(chunk)
+                segment[2] += len(chunk)
+                if on_progress:
+                    on_progress()
+                if time.time() - chunk_start < 0.25 and chunk_size < 8 * 1024 * 1024:
+                    chunk_size *= 2
+    if start + segment[2] <= end:
+        raise RuntimeError(f"Connection closed early at byte {start + segment[2]}")
+
+
+def safe_extract_path(base_path, name):
+    # Where archive member name should be written, refusing absolute paths
+    # and ".." components that would escape base_path
+    root = os.path.realpath(base_path or ".")
+    target = os.path.realpath(os.path.join(root, name))
+    if os.path.isabs(name) or os.path.commonpath([root, target]) != root:
+        raise RuntimeError(f"Refusing to extract {name!r} outside {root}")
+    return target
+
+
+def check_tar_members(members, base_path):
+    # Validate each member (and link target) before it is extracted
+    for member in members:
+        safe_extract_path(base_path, member.name)
+        if member.issym():
+            safe_extract_path(
+                base_path, os.path.join(os.path.dirname(member.name), member.linkname)
+            )
+        elif member.islnk():
+            safe_extract_path(base_path, member.linkname)
+        elif not (member.isfile() or member.isdir()):
+            raise RuntimeError(f"Refusing to extract special file {member.name!r}")
+        yield member
+
+
+def extract_tar(tfile, base_path):
+    # The "data" filter (Python 3.12, backported to 3.9.17+) re-checks members
+    filter_args = {"filter": "data"} if hasattr(tarfile, "data_filter") else {}
+    for member in check_tar_members(tfile, base_path):
+        tfile.extract(member, base_path, **filter_args)
+
+
+class ChunkReader(io.RawIOBase):
+    # Read-only file object over an iterator of byte chunks
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.pending = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self.pending:
+            self.pending = next(self.chunks, None)
+            if self.pending is None:
+                self.pending = b""
+                return 0
+        n = min(len(b), len(self.pending))
+        b[:n] = self.pending[:n]
+        self.pending = self.pending[n:]
+        return n
+
+
+ZIP_LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+ZIP_LOCAL_SIGNATURE = 0x04034B50
+ZIP_DESCRIPTOR_SIGNATURE = 0x08074B50
+# Records that follow the last member: central directory, zip64 end of
+# central directory and end of central directory
+ZIP_TRAILER_SIGNATURES = (0x02014B50, 0x06064B50, 0x06054B50)
+
+
+def stream_extract_zip(chunks, base_path):
+    # Extract a zip archive from an iterator of byte chunks by walking its
+    # local file headers, so nothing but the extracted members hits disk.
+    # Supports stored and deflated members, data descriptors and zip64.
+    buffer = bytearray()
+    chunks = iter(chunks)
+
+    def fill(n):
+        while len(buffer) < n:
+            chunk = next(chunks, None)
+            if chunk is None:
+                return False
+            buffer.extend(chunk)
+        return True
+
+    def take(n):
+        if not fill(n):
+            raise RuntimeError("Truncated zip stream")
+        data = bytes(buffer[:n])
+        del buffer[:n]
+        return data
+
+    def skip_descriptor(zip64):
+        # Returns the CRC from the data descriptor after a member, whose
+        # signature is optional
+        if fill(4) and struct.unpack("<I", buffer[:4])[0] == ZIP_DESCRIPTOR_SIGNATURE:
+            take(4)
+        crc = struct.unpack("<I", take(4))[0]
+        take(16 if zip64 else 8)
+        return crc
+
+    while fill(4) and struct.unpack("<I", buffer[:4])[0] == ZIP_LOCAL_SIGNATURE:
+        header = ZIP_LOCAL_HEADER.unpack(take(ZIP_LOCAL_HEADER.size))
+        flags, method = header[2], header[3]
+        crc, compressed_size, size, name_len, extra_len = header[6:]
+        name = take(name_len).decode("utf-8" if flags & 0x800 else "cp437")
+        extra = take(extra_len)
+        if flags & 0x01:
+            raise RuntimeError(f"Encrypted zip member {name!r} is not supported")
+
+        # zip64 sizes live in extra field 0x0001
+        zip64 = False
+        offset = 0
+        while offset + 4 <= len(extra):
+            field_id, field_len = struct.unpack("<HH", extra[offset : offset + 4])
+            field = extra[offset + 4 : offset + 4 + field_len]
+            if field_id == 0x0001:
+                zip64 = True
+                count = len(field) // 8
+                values = list(struct.unpack(f"<{count}Q", field[: count * 8]))
+                if size == 0xFFFFFFFF and values:
+                    size = values.pop(0)
+                if compressed_size == 0xFFFFFFFF and values:
+                    compressed_size = values.pop(0)
+            offset += 4 + field_len
+
+        has_descriptor = flags & 0x08
+        target = safe_extract_path(base_path, name)
+        if name.endswith("/"):
+            os.makedirs(target, exist_ok=True)
+            take(compressed_size)
+            if has_descriptor:
+                skip_descriptor(zip64)
+            continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+
+        actual_crc = 0
+        with open(target, "wb") as f:
+            if method == 0:
+                if has_descriptor:
+                    raise RuntimeError(
+                        f"Stored zip member {name!r} has no size, cannot stream it"
+                    )
+                remaining = compressed_size
+                while remaining:
+                    if not fill(1):
+                        raise RuntimeError(f"Truncated zip member {name!r}")
+                    data = take(min(remaining, len(buffer)))
+                    remaining -= len(data)
+                    actual_crc = zlib.crc32(data, actual_crc)
+                    f.write(data)
+            elif method == 8:
+                decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+                remaining = None if has_descriptor else compressed_size
+                while not decompressor.eof:
+                    if remaining == 0 or not fill(1):
+                        raise RuntimeError(f"Truncated zip member {name!r}")
+                    n = len(buffer) if remaining is None else min(len(buffer), remaining)
+                    data = take(n)
+                    if remaining is not None:
+                        remaining -= n
+                    output = decompressor.decompress(data)
+                    actual_crc = zlib.crc32(output, actual_crc)
+                    f.write(output)
+                # Bytes read past the end of the member belong to the next header
+                buffer[:0] = decompressor.unused_data
+            else:
+                raise RuntimeError(
+                    f"Unsupported compression method {method} for {name!r}"
+                )
+
+        if has_descriptor:
+            crc = skip_descriptor(zip64)
+        if actual_crc != crc:
+            raise RuntimeError(f"CRC mismatch for zip member {name!r}")
+
+    # The members end where the central directory starts. Anything else
+    # means the stream was cut short or misparsed, and members would be
+    # silently missing.
+    if not fill(4) or struct.unpack("<I", buffer[:4])[0] not in ZIP_TRAILER_SIGNATURES:
+        raise RuntimeError("Zip stream ended before the central directory")
+
+
+def extract_from_stream(packet_url, base_path="", headers=None, sha256=None):
+    # Extract straight from the HTTP response without saving the archive
+    import requests
+
+    packet_file = os.path.basename(packet_url)
+    digest = hashlib.sha256()
+
+    def chunks(r):
+        for chunk in r.iter_content(chunk_size=1024 * 1024):
+            digest.update(chunk)
+            yield chunk
+
+    with requests.get(
+        packet_url, stream=True, headers=headers, timeout=(10, 60)
+    ) as r:
+        r.raise_for_status()
+        if packet_file.endswith(".zip"):
+            stream_extract_zip(chunks(r), base_path)
+        else:
+            with tarfile.open(fileobj=ChunkReader(chunks(r)), mode="r|*") as tfile:
+                extract_tar(tfile, base_path)
+
+    if sha256 and digest.hexdigest() != sha256:
+        raise RuntimeError(
+            f"Checksum mismatch for {packet_url}, the extracted files in "
+            f"{base_path or '.'} are not trustworthy"
+        )
+    return digest.hexdigest()
+
+
+def download_file(
+    packet_url,
+    base_path="",
+    extract=False,
+    headers=None,
+    sha256=None,
+    num_workers=4,
+    max_retries=5,
+    stream_extract=False,
+):
+    # Returns the sha256 of the downloaded file
+    import requests
+
     if base_path != "":
         if not os.path.exists(base_path):
             os.mkdir(base_path)
     packet_file = os.path.basename(packet_url)
-    with requests.get(packet_url, stream=True, headers=headers) as r:
+    if extract and stream_extract:
+        # Halves disk I/O and peak disk usage, but cannot resume
+        return extract_from_stream(packet_url, base_path, headers=headers, sha256=sha256)
+
+    file_path = os.path.join(base_path, packet_file)
+    # In-progress downloads live in .part, with the completed byte ranges
+    # in .part.json so an interrupted download can be resumed
+    part_path = file_path + ".part"
+    state_path = part_path + ".json"
+
+    # Find the size and whether the server supports range requests
+    with requests.head(
+        packet_url, headers=headers, allow_redirects=True, timeout=30
+    ) as r:
         r.raise_for_status()
-        with open(os.path.join(base_path, packet_file), "wb") as f:
-            for chunk in r.iter_content(chunk_size=8192):
-                f.write(chunk)
+        size = int(r.headers.get("Content-Length", 0))
+        supports_ranges = r.headers.get("Accept-Ranges") == "bytes" and size > 0
+        # Identifies the version of the file on the server
+        validator = r.headers.get("ETag") or r.headers.get("Last-Modified")
+
+    if supports_ranges:
+        state = None
+        if os.path.exists(state_path) and os.path.exists(part_path):
+            with open(state_path, "r") as f:
+                state = json.load(f)
+            # Only resume onto bytes of the same version of the file. A
+            # server without ETag or Last-Modified cannot tell, so the
+            # download starts over.
+            if (
+                state.get("url") != packet_url
+                or state.get("size") != size
+                or validator is None
+                or state.get("validator") != validator
+            ):
+                print(f"{packet_file} changed on the server, restarting the download")
+                state = None
+        if state is None:
+            segment_size = -(-size // num_workers)
+            state = {
+                "url": packet_url,
+                "size": size,
+                "validator": validator,
+                "segments": [
+                    [start, min(start + segment_size, size) - 1, 0]
+                    for start in range(0, size, segment_size)
+                ],
+            }
+            with open(part_path, "wb") as f:
+                f.truncate(size)
+        else:
+            done = sum(segment[2] for segment in state["segments"])
+            print(
+                f"Resuming download of {packet_file} "
+                f"at {done / 1e6:.1f}/{size / 1e6:.1f} MB"
+            )
+
+        # The server answers 200 with the whole new file instead of 206 if
+        # it changes while downloading, which fetch_range refuses. Weak
+        # ETags cannot be used for this.
+        range_headers = dict(headers or {})
+        if validator and not validator.startswith("W/"):
+            range_headers["If-Range"] = validator
+
+        state_lock = threading.Lock()
+        last_save = [0.0]
+
+        def on_progress():
+            # Persist progress at most once a second
+            with state_lock:
+                if time.time() - last_save[0] >= 1.0:
+                    save_checkpoint(state_path, state)
+                    last_save[0] = time.time()
+
+        def fetch_with_retries(segment):
+            for attempt in range(max_retries + 1):
+                try:
+                    return fetch_range(
+                        packet_url, part_path, segment, range_headers, on_progress
+                    )
+                except Exception as e:
+                    if attempt == max_retries:
+                        raise
+                    print(f"Retrying range {segment[0]}-{segment[1]} after error: {e}")
+                    time.sleep(2**attempt)
+
+        # Segments are downloaded in parallel over separate connections
+        try:
+            with ThreadPoolExecutor(max_workers=num_workers) as executor:
+                list(executor.map(fetch_with_retries, state["segments"]))
+        finally:
+            with state_lock:
+                save_checkpoint(state_path, state)
+    else:
+        # No range support, fall back to a single streamed request
+        with requests.get(
+            packet_url, stream=True, headers=headers, timeout=(10, 60)
+        ) as r:
+            r.raise_for_status()
+            with open(part_path, "wb") as f:
+                for chunk in r.iter_content(chunk_size=1024 * 1024):
+                    f.write(chunk)
+
+    digest = file_sha256(part_path)
+    if sha256 and digest != sha256:
+        os.remove(part_path)
+        if os.path.exists(state_path):
+            os.remove(state_path)
+        raise RuntimeError(f"Checksum mismatch for {packet_url}, removed the download")
+
+    os.replace(part_path, file_path)
+    if os.path.exists(state_path):
+        os.remove(state_path)
 
     if extract:
         if packet_file.endswith(".zip"):
             with zipfile.ZipFile(os.path.join(base_path, packet_file)) as zfile:
+                for name in zfile.namelist():
+                    safe_extract_path(base_path, name)
                 zfile.extractall(base_path)
         else:
             with tarfile.open(os.path.join(base_path, packet_file)) as tfile:
-                tfile.extractall(base_path)
+                extract_tar(tfile, base_path)
+    return digest
+
 
+def make_serving_functions(prediction_model):
+    # Serving signatures exported next to serving_default. They take raw
+    # uint8 pixels or encoded image bytes and do the preprocessing in-graph.
+    import tensorflow as tf
+
+    height = data_details["image_height"]
+    width = data_details["image_width"]
+    num_channels = data_details["num_channels"]
+
+    def serve(images):
+        return prediction_model(images, training=False)
+
+    def serve_uint8(images):
+        return serve(tf.cast(images, tf.float32) / 255.0)
+
+    def decode_and_resize(image_bytes):
+        img = tf.io.decode_image(
+            image_bytes, channels=num_channels, expand_animations=False
+        )
+        img = tf.image.resize(img, [height, width], method="bicubic", antialias=True)
+        return tf.clip_by_value(img, 0.0, 255.0)
+
+    def serve_bytes(image_bytes):
+        images = tf.map_fn(
+            decode_and_resize,
+            image_bytes,
+            fn_output_signature=tf.TensorSpec([height, width, num_channels], tf.float32),
+        )
+        return serve(images / 255.0)
+
+    image_shape = [None, height, width, num_channels]
+    return {
+        "serve": (serve, tf.TensorSpec(image_shape, tf.float32)),
+        "serving_uint8": (serve_uint8, tf.TensorSpec(image_shape, tf.uint8)),
+        "serving_bytes": (serve_bytes, tf.TensorSpec([None], tf.string)),
+    }
+
+
+def export_model(prediction_model, model_export_path):
+    import tensorflow as tf
+
+    serving_functions = make_serving_functions(prediction_model)
+
+    if hasattr(tf.keras, "export") and hasattr(tf.keras.export, "ExportArchive"):
+        print("Using Keras 3 ExportArchive")
+        export_archive = tf.keras.export.ExportArchive()
+        export_archive.track(prediction_model)
+        # The first endpoint also becomes serving_default
+        for name, (fn, input_spec) in serving_functions.items():
+            export_archive.add_endpoint(name=name, fn=fn, input_signature=[input_spec])
+        export_archive.write_out(model_export_path)
+    else:
+        print("Using tf.saved_model.save()")
+        signatures = {}
+        for name, (fn, input_spec) in serving_functions.items():
+            signatures[name] = tf.function(fn).get_concrete_function(input_spec)
+        signatures["serving_default"] = signatures.pop("serve")
+        tf.saved_model.save(prediction_model, model_export_path, signatures=signatures)
+
+
+class UploadProgress:
+    # boto3 transfer callback that prints progress and throughput
+    def __init__(self, total_bytes, interval=5.0):
+        self.total_bytes = total_bytes
+        self.interval = interval
+        self.uploaded = 0
+        self.start = time.time()
+        self.last_print = self.start
+        self.lock = threading.Lock()
+
+    def __call__(self, bytes_amount):
+        with self.lock:
+            self.uploaded += bytes_amount
+            now = time.time()
+            done = self.uploaded >= self.total_bytes
+            if done or now - self.last_print >= self.interval:
+                self.last_print = now
+                print(
+                    f"Uploaded {self.uploaded / 1e6:.1f}/{self.total_bytes / 1e6:.1f} MB "
+                    f"({100 * self.uploaded / max(1, self.total_bytes):.0f}%, "
+                    f"{self.uploaded / 1e6 / max(1e-6, now - self.start):.1f} MB/s)"
+                )
+
+
+def checksum_digest(data, algorithm):
+    if algorithm == "SHA256":
+        return hashlib.sha256(data).digest()
+    if algorithm == "SHA1":
+        return hashlib.sha1(data).digest()
+    if algorithm == "CRC32":
+        return zlib.crc32(data).to_bytes(4, "big")
+    if algorithm == "CRC32C":
+        # boto3 needs awscrt for CRC32C as well
+        from awscrt import checksums
+
+        return checksums.crc32c(data).to_bytes(4, "big")
+    raise ValueError(f"Unsupported checksum algorithm: {algorithm}")
+
+
+def expected_s3_checksum(path, algorithm, part_size, checksum_type):
+    # The checksum S3 reports for path uploaded with this part size:
+    # the plain checksum for single-part or FULL_OBJECT uploads, otherwise the
+    # checksum of the concatenated part checksums followed by "-<parts>"
+    file_size = os.path.getsize(path)
+    if file_size < part_size or checksum_type == "FULL_OBJECT":
+        if algorithm in ("SHA256", "SHA1"):
+            digest = hashlib.new(algorithm.lower())
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(8 * 1024 * 1024), b""):
+                    digest.update(block)
+            return base64.b64encode(digest.digest()).decode("ascii")
+        with open(path, "rb") as f:
+            crc = 0
+            for block in iter(lambda: f.read(8 * 1024 * 1024), b""):
+                if algorithm == "CRC32":
+                    crc = zlib.crc32(block, crc)
+                else:
+                    from awscrt import checksums
+
+                    crc = checksums.crc32c(block, crc)
+        return base64.b64encode(crc.to_bytes(4, "big")).decode("ascii")
+
+    part_digests = []
+    with open(path, "rb") as f:
+        for part in iter(lambda: f.read(part_size), b""):
+            part_digests.append(checksum_digest(part, algorithm))
+    composite = checksum_digest(b"".join(part_digests), algorithm)
+    return f"{base64.b64encode(composite).decode('ascii')}-{len(part_digests)}"
+
+
+def upload_model_artifact(
+    s3_client,
+    path,
+    bucket,
+    key,
+    part_size_mb=64,
+    max_concurrency=10,
+    checksum_algorithm="SHA256",
+    metadata=None,
+):
+    # Parallel multipart upload with per-part checksums, then compare the
+    # checksum S3 computed against the local file
+    file_size = os.path.getsize(path)
+    # Same adjustment boto3 applies to stay within S3's 10,000 part limit
+    part_size = ChunksizeAdjuster().adjust_chunksize(
+        part_size_mb * 1024 * 1024, file_size
+    )
+    transfer_config = TransferConfig(
+        multipart_threshold=part_size,
+        multipart_chunksize=part_size,
+        max_concurrency=max_concurrency,
+        use_threads=True,
+    )
+
+    start = time.time()
+    s3_client.upload_file(
+        path,
+        bucket,
+        key,
+        ExtraArgs={
+            "ChecksumAlgorithm": checksum_algorithm,
+            "Metadata": metadata or {},
+        },
+        Config=transfer_config,
+        Callback=UploadProgress(file_size),
+    )
+    elapsed = time.time() - start
+    print(
+        f"Uploaded {file_size / 1e6:.1f} MB in {elapsed:.1f}s "
+        f"({file_size / 1e6 / max(1e-6, elapsed):.1f} MB/s)"
+    )
+
+    head = s3_client.head_object(Bucket=bucket, Key=key, ChecksumMode="ENABLED")
+    actual = head.get(f"Checksum{checksum_algorithm}")
+    expected = expected_s3_checksum(
+        path, checksum_algorithm, part_size, head.get("ChecksumType")
+    )
+    # Some S3 APIs omit the "-<parts>" suffix, so only compare it when present
+    actual_digest, _, actual_parts = (actual or "").partition("-")
+    expected_digest, _, expected_parts = expected.partition("-")
+    parts_match = not actual_parts or actual_parts == expected_parts
+    if actual_digest != expected_digest or not parts_match:
+        # Never leave a corrupt artifact behind for deploy() to pick up
+        s3_client.delete_object(Bucket=bucket, Key=key)
+        raise RuntimeError(
+            f"Checksum mismatch for s3://{bucket}/{key}: expected {expected}, got {actual}"
+        )
+    print(f"Verified {checksum_algorithm} checksum {actual}")
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(8 * 1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def content_hash(*parts):
+    # Hash of file hashes, directory trees and settings, in order
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str) and os.path.isdir(part):
+            for root, dirs, files in os.walk(part):
+                dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+                for name in sorted(files):
+                    file_path = os.path.join(root, name)
+                    digest.update(os.path.relpath(file_path, part).encode("utf-8"))
+                    digest.update(file_sha256(file_path).encode("utf-8"))
+        else:
+            digest.update(json.dumps(part, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def load_manifest(manifest_path):
+    try:
+        with open(manifest_path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_manifest(manifest_path, manifest):
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def s3_content_hash(s3_client, bucket, key):
+    try:
+        head = s3_client.head_object(Bucket=bucket, Key=key)
+    except ClientError:
+        return None
+    return head.get("Metadata", {}).get("content-hash")
+
+
+def add_model_files(tar, model_export_path):
+    tar.add(model_export_path, arcname="1")
+    # Custom handlers so the endpoint also accepts binary tensors
+    tar.add(
+        "serving",
+        arcname="code",
+        filter=lambda info: None if "__pycache__" in info.name else info,
+    )
+
+
+def package_model(
+    model_export_path, model_tar_path, compression="gzip", compression_level=9
+):
+    # Build model.tar.gz. "pigz" deflates blocks on all cores, "none" stores
+    # the tar uncompressed inside a gzip container (level 0), which SageMaker
+    # still accepts as model.tar.gz
+    start = time.time()
+    if compression == "pigz":
+        with open(model_tar_path, "wb") as f, ParallelGzipWriter(
+            f, level=compression_level
+        ) as gz, tarfile.open(fileobj=gz, mode="w|") as tar:
+            add_model_files(tar, model_export_path)
+    else:
+        level = 0 if compression == "none" else compression_level
+        with tarfile.open(model_tar_path, "w:gz", compresslevel=level) as tar:
+            add_model_files(tar, model_export_path)
+    elapsed = time.time() - start
+    size = os.path.getsize(model_tar_path)
+    print(f"Packaged {model_tar_path} ({size / 1e6:.1f} MB) in {elapsed:.1f}s")
+    return elapsed, size
+
+
+def prepare(
+    upload_part_size_mb=64,
+    upload_concurrency=10,
+    checksum_algorithm="SHA256",
+    force=False,
+    stream_extract=False,
+    compression="gzip",
+    compression_level=9,
+    multi_model_name=None,
+    optimize=False,
+    jit_compile=False,
+    quantize=False,
+    tflite=False,
+    tflite_variant="float32",
+    onnx=False,
+    onnx_opset=17,
+    model_sha256=MODEL_RELEASE_SHA256,
+):
+    import tensorflow as tf
+    from graph_optimize import save_optimized
+    from quantize import TFLITE_VARIANTS, convert_tflite
 
-def prepare():
     # Initialize S3 client
     s3_client = boto3.client("s3", region_name=AWS_REGION)
 
@@ -81,83 +858,423 @@ def prepare():
     except s3_client.exceptions.BucketAlreadyOwnedByYou:
         print(f"Bucket {S3_MODELS_BUCKET_NAME} already owned by you")
 
-    download_file(
-        "https://github.com/dlops-io/model-deployment-aws/releases/download/v1.0/mobilenetv2_train_base_True.zip",
-        base_path="artifacts",
-        extract=True,
-    )
+    # Every stage below is skipped when its output already exists and was
+    # built from the same inputs, as recorded in the manifest
+    local_model_dir = f"./artifacts/{BEST_MODEL}"
+    os.makedirs(local_model_dir, exist_ok=True)
+    manifest_path = os.path.join(local_model_dir, "manifest.json")
+    manifest = {} if force else load_manifest(manifest_path)
 
     prediction_model_path = (
         "./artifacts/mobilenetv2_train_base_True.keras"
     )
 
-    # Load model
-    prediction_model = tf.keras.models.load_model(prediction_model_path)
-
-    # Save model locally first
-    local_model_dir = f"./artifacts/{BEST_MODEL}"
-    os.makedirs(local_model_dir, exist_ok=True)
+    # Download model. The digest recorded by an earlier download survives
+    # --force, so a re-download is still checked against it.
+    cached_url = manifest.get("download", {}).get("url")
+    if cached_url == MODEL_RELEASE_URL and os.path.exists(prediction_model_path):
+        print("Model download is up to date, skipping")
+    else:
+        recorded_download = load_manifest(manifest_path).get("download", {})
+        expected_sha256 = model_sha256 or (
+            recorded_download.get("sha256")
+            if recorded_download.get("url") == MODEL_RELEASE_URL
+            else None
+        )
+        if expected_sha256 is None:
+            print(
+                "Warning: no sha256 pinned for the model release, recording the "
+                "digest of this download (set MODEL_RELEASE_SHA256 to pin it)"
+            )
+        sha256 = download_file(
+            MODEL_RELEASE_URL,
+            base_path="artifacts",
+            extract=True,
+            sha256=expected_sha256,
+            stream_extract=stream_extract,
+        )
+        manifest["download"] = {"url": MODEL_RELEASE_URL, "sha256": sha256}
+        save_manifest(manifest_path, manifest)
 
     # Save model in TensorFlow SavedModel format
     model_export_path = os.path.join(
         local_model_dir, "1"
     )  # SageMaker expects version number
 
-    # Export using Keras 3 export() if available, otherwise fall back to tf.saved_model.save
-    if hasattr(prediction_model, "export"):
-        print("Using Keras 3 export()")
-        prediction_model.export(model_export_path)
+    export_hash = content_hash(
+        file_sha256(prediction_model_path),
+        EXPORT_VERSION,
+        tf.__version__,
+        {"optimize": optimize, "jit_compile": jit_compile},
+    )
+    cached_hash = manifest.get("export", {}).get("hash")
+    if cached_hash == export_hash and os.path.exists(model_export_path):
+        print("SavedModel export is up to date, skipping")
     else:
-        print("Using tf.saved_model.save()")
-        tf.saved_model.save(prediction_model, model_export_path)
+        # Load model
+        prediction_model = tf.keras.models.load_model(prediction_model_path)
+
+        # Export using Keras 3 ExportArchive if available, otherwise fall back to tf.saved_model.save
+        shutil.rmtree(model_export_path, ignore_errors=True)
+        if optimize:
+            # Keep the plain export to measure the optimized one against
+            shutil.rmtree(RAW_MODEL_PATH, ignore_errors=True)
+            export_model(prediction_model, RAW_MODEL_PATH)
+            print("Optimizing serving graphs")
+            save_optimized(
+                make_serving_functions(prediction_model),
+                model_export_path,
+                jit_compile=jit_compile,
+            )
+            compare_latency(
+                RAW_MODEL_PATH,
+                model_export_path,
+                report_path=os.path.join(local_model_dir, "optimize_report.json"),
+            )
+        else:
+            export_model(prediction_model, model_export_path)
+        manifest["export"] = {"hash": export_hash}
+        save_manifest(manifest_path, manifest)
+
+    # Quantized variants are only measured, the endpoint keeps serving the
+    # SavedModel. int8 is calibrated on data/, so it is part of the hash.
+    if quantize:
+        quantize_hash = content_hash(
+            file_sha256(prediction_model_path),
+            tf.__version__,
+            "data",
+            TFLITE_VARIANTS,
+        )
+        cached_hash = manifest.get("quantize", {}).get("hash")
+        if cached_hash == quantize_hash and os.path.exists(QUANTIZED_MODEL_DIR):
+            print("Quantized models are up to date, skipping")
+        else:
+            prediction_model = tf.keras.models.load_model(prediction_model_path)
+            shutil.rmtree(QUANTIZED_MODEL_DIR, ignore_errors=True)
+            export_quantized(prediction_model, QUANTIZED_MODEL_DIR)
+            compare_quantized(
+                model_export_path,
+                QUANTIZED_MODEL_DIR,
+                report_path=os.path.join(local_model_dir, "quantize_report.json"),
+            )
+            manifest["quantize"] = {"hash": quantize_hash}
+            save_manifest(manifest_path, manifest)
+
+    # TFLite model for the tflite backend of the local runner
+    if tflite:
+        tflite_hash = content_hash(
+            file_sha256(prediction_model_path),
+            tf.__version__,
+            tflite_variant,
+            "data" if tflite_variant == "int8" else None,
+        )
+        cached_hash = manifest.get("tflite", {}).get("hash")
+        if cached_hash == tflite_hash and os.path.exists(LOCAL_TFLITE_PATH):
+            print("TFLite model is up to date, skipping")
+        else:
+            print(f"Converting {tflite_variant} TFLite model to {LOCAL_TFLITE_PATH}")
+            prediction_model = tf.keras.models.load_model(prediction_model_path)
+            representative_images = (
+                load_sample_images()[1] if tflite_variant == "int8" else None
+            )
+            tflite_model = convert_tflite(
+                prediction_model, tflite_variant, representative_images=representative_images
+            )
+            with open(LOCAL_TFLITE_PATH, "wb") as f:
+                f.write(tflite_model)
+            manifest["tflite"] = {"hash": tflite_hash}
+            save_manifest(manifest_path, manifest)
+
+    # ONNX model for the onnx backend of the local runner
+    if onnx:
+        from onnx_export import convert_onnx
+        import onnxruntime
+
+        onnx_hash = content_hash(
+            file_sha256(prediction_model_path),
+            tf.__version__,
+            onnxruntime.__version__,
+            {"opset": onnx_opset},
+        )
+        cached_hash = manifest.get("onnx", {}).get("hash")
+        if cached_hash == onnx_hash and os.path.exists(LOCAL_ONNX_PATH):
+            print("ONNX model is up to date, skipping")
+        else:
+            print(f"Converting model to ONNX opset {onnx_opset} in {LOCAL_ONNX_PATH}")
+            prediction_model = tf.keras.models.load_model(prediction_model_path)
+            convert_onnx(prediction_model, LOCAL_ONNX_PATH, opset=onnx_opset)
+            manifest["onnx"] = {"hash": onnx_hash}
+            save_manifest(manifest_path, manifest)
 
     # Create tar.gz archive for SageMaker
     model_tar_path = f"{local_model_dir}/model.tar.gz"
-    with tarfile.open(model_tar_path, "w:gz") as tar:
-        tar.add(model_export_path, arcname="1")
+    archive_hash = content_hash(
+        export_hash,
+        "serving",
+        {"compression": compression, "compression_level": compression_level},
+    )
+    cached_hash = manifest.get("archive", {}).get("hash")
+    if cached_hash == archive_hash and os.path.exists(model_tar_path):
+        print("model.tar.gz is up to date, skipping")
+    else:
+        package_model(model_export_path, model_tar_path, compression, compression_level)
+        manifest["archive"] = {"hash": archive_hash}
+        save_manifest(manifest_path, manifest)
 
-    # Upload to S3
+    # Upload to S3, unless the object there was built from the same inputs
     s3_key = f"{BEST_MODEL}/model.tar.gz"
-    print(f"Uploading model to s3://{S3_MODELS_BUCKET_NAME}/{s3_key}")
-    s3_client.upload_file(model_tar_path, S3_MODELS_BUCKET_NAME, s3_key)
-    print("Model uploaded successfully to S3")
+    uploaded_hash = s3_content_hash(s3_client, S3_MODELS_BUCKET_NAME, s3_key)
+    if not force and uploaded_hash == archive_hash:
+        print(f"s3://{S3_MODELS_BUCKET_NAME}/{s3_key} is up to date, skipping upload")
+    else:
+        print(f"Uploading model to s3://{S3_MODELS_BUCKET_NAME}/{s3_key}")
+        upload_model_artifact(
+            s3_client,
+            model_tar_path,
+            S3_MODELS_BUCKET_NAME,
+            s3_key,
+            part_size_mb=upload_part_size_mb,
+            max_concurrency=upload_concurrency,
+            checksum_algorithm=checksum_algorithm,
+            metadata={"content-hash": archive_hash},
+        )
+        print("Model uploaded successfully to S3")
 
+    if multi_model_name:
+        register_multi_model(s3_client, s3_key, multi_model_name, archive_hash, force)
+
+
+def register_multi_model(s3_client, s3_key, name, archive_hash, force=False):
+    # Copy the uploaded artifact to MULTI_MODEL_PREFIX/<name>.tar.gz, where a
+    # multi-model endpoint loads it on the first request naming it. The copy
+    # happens inside S3, nothing is uploaded again.
+    bucket, prefix = split_s3_uri(MULTI_MODEL_PREFIX)
+    target_key = f"{prefix}{name}.tar.gz"
+    if not force and s3_content_hash(s3_client, bucket, target_key) == archive_hash:
+        print(f"s3://{bucket}/{target_key} is up to date, skipping")
+        return
+    print(f"Adding model to multi-model prefix as s3://{bucket}/{target_key}")
+    s3_client.copy(
+        {"Bucket": S3_MODELS_BUCKET_NAME, "Key": s3_key},
+        bucket,
+        target_key,
+        ExtraArgs={
+            "Metadata": {"content-hash": archive_hash},
+            "MetadataDirective": "REPLACE",
+        },
+    )
+
+
+def list_multi_models(s3_client=None):
+    # Model names under MULTI_MODEL_PREFIX, as passed to --target-model
+    if s3_client is None:
+        s3_client = boto3.client("s3", region_name=AWS_REGION)
+    bucket, prefix = split_s3_uri(MULTI_MODEL_PREFIX)
+    paginator = s3_client.get_paginator("list_objects_v2")
+    names = []
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get("Contents", []):
+            if obj["Key"].endswith(".tar.gz"):
+                names.append(obj["Key"][len(prefix):-len(".tar.gz")])
+    return names
+
+
+def configure_autoscaling(
+    endpoint_name,
+    variant_name="AllTraffic",
+    min_capacity=1,
+    max_capacity=1,
+    target_invocations=100.0,
+    scale_in_cooldown=300,
+    scale_out_cooldown=60,
+    autoscaling_client=None,
+):
+    # Register the endpoint variant with Application Auto Scaling and track
+    # target_invocations invocations per instance per minute
+    if autoscaling_client is None:
+        autoscaling_client = boto3.client(
+            "application-autoscaling", region_name=AWS_REGION
+        )
+    resource_id = f"endpoint/{endpoint_name}/variant/{variant_name}"
+
+    print(f"Scaling {resource_id} between {min_capacity} and {max_capacity} instances")
+    autoscaling_client.register_scalable_target(
+        ServiceNamespace="sagemaker",
+        ResourceId=resource_id,
+        ScalableDimension="sagemaker:variant:DesiredInstanceCount",
+        MinCapacity=min_capacity,
+        MaxCapacity=max_capacity,
+    )
+    autoscaling_client.put_scaling_policy(
+        PolicyName=f"{endpoint_name}-invocations-per-instance",
+        ServiceNamespace="sagemaker",
+        ResourceId=resource_id,
+        ScalableDimension="sagemaker:variant:DesiredInstanceCount",
+        PolicyType="TargetTrackingScaling",
+        TargetTrackingScalingPolicyConfiguration={
+            "TargetValue": float(target_invocations),
+            "PredefinedMetricSpecification": {
+                "PredefinedMetricType": "SageMakerVariantInvocationsPerInstance"
+            },
+            "ScaleInCooldown": scale_in_cooldown,
+            "ScaleOutCooldown": scale_out_cooldown,
+        },
+    )
+
+
+def save_autoscaling(endpoint_name, variant_name="AllTraffic", autoscaling_client=None):
+    # The scalable target and scaling policies of the variant, for
+    # restore_autoscaling(), or None if it does not autoscale
+    if autoscaling_client is None:
+        autoscaling_client = boto3.client(
+            "application-autoscaling", region_name=AWS_REGION
+        )
+    resource_id = f"endpoint/{endpoint_name}/variant/{variant_name}"
+    targets = autoscaling_client.describe_scalable_targets(
+        ServiceNamespace="sagemaker", ResourceIds=[resource_id]
+    )["ScalableTargets"]
+    if not targets:
+        return None
+    policies = autoscaling_client.describe_scaling_policies(
+        ServiceNamespace="sagemaker", ResourceId=resource_id
+    )["ScalingPolicies"]
+    return {"target": targets[0], "policies": policies}
 
-def deploy():
-    # Initialize SageMaker session
-    sagemaker_session = sagemaker.Session()
+
+def restore_autoscaling(saved, autoscaling_client=None):
+    # Register a target and policies returned by save_autoscaling() again
+    if autoscaling_client is None:
+        autoscaling_client = boto3.client(
+            "application-autoscaling", region_name=AWS_REGION
+        )
+    target = saved["target"]
+    autoscaling_client.register_scalable_target(
+        ServiceNamespace="sagemaker",
+        ResourceId=target["ResourceId"],
+        ScalableDimension=target["ScalableDimension"],
+        MinCapacity=target["MinCapacity"],
+        MaxCapacity=target["MaxCapacity"],
+    )
+    for policy in saved["policies"]:
+        policy_config = {
+            key: policy[key]
+            for key in (
+                "TargetTrackingScalingPolicyConfiguration",
+                "StepScalingPolicyConfiguration",
+            )
+            if key in policy
+        }
+        autoscaling_client.put_scaling_policy(
+            PolicyName=policy["PolicyName"],
+            ServiceNamespace="sagemaker",
+            ResourceId=policy["ResourceId"],
+            ScalableDimension=policy["ScalableDimension"],
+            PolicyType=policy["PolicyType"],
+            **policy_config,
+        )
+    print(f"Restored autoscaling of {target['ResourceId']}")
+
+
+def autoscale(
+    min_capacity=1,
+    max_capacity=1,
+    target_invocations=100.0,
+    scale_in_cooldown=300,
+    scale_out_cooldown=60,
+):
+    # Update the scaling policy of the endpoint in endpoint_config.json
+    with open("endpoint_config.json", "r") as f:
+        endpoint_config = json.load(f)
+    if endpoint_config.get("mode") == "serverless":
+        print("Serverless endpoints scale on their own, use --serverless-max-concurrency")
+        return
+    autoscaling = {
+        "min_capacity": min_capacity,
+        "max_capacity": max_capacity,
+        "target_invocations": target_invocations,
+        "scale_in_cooldown": scale_in_cooldown,
+        "scale_out_cooldown": scale_out_cooldown,
+    }
+    configure_autoscaling(endpoint_config["endpoint_name"], **autoscaling)
+
+    endpoint_config["autoscaling"] = autoscaling
+    with open("endpoint_config.json", "w") as f:
+        json.dump(endpoint_config, f, indent=2)
+
+
+def get_role():
+    from sagemaker import get_execution_role
 
     # Get execution role - you need to set this in environment or use IAM role
     if SAGEMAKER_ROLE:
-        role = SAGEMAKER_ROLE
-    else:
-        # This works if running on SageMaker notebook instance or with proper IAM setup
-        try:
-            role = get_execution_role()
-        except Exception as e:
-            print(f"Error getting execution role: {e}")
-            print(
-                "Please set SAGEMAKER_ROLE environment variable with your SageMaker execution role ARN"
-            )
-            print(
-                "Example: arn:aws:iam::123456789012:role/service-role/AmazonSageMaker-ExecutionRole"
-            )
-            return
+        return SAGEMAKER_ROLE
+    # This works if running on SageMaker notebook instance or with proper IAM setup
+    try:
+        return get_execution_role()
+    except Exception as e:
+        print(f"Error getting execution role: {e}")
+        print(
+            "Please set SAGEMAKER_ROLE environment variable with your SageMaker execution role ARN"
+        )
+        print(
+            "Example: arn:aws:iam::123456789012:role/service-role/AmazonSageMaker-ExecutionRole"
+        )
+        return None
+
+
+def make_tensorflow_model(role, sagemaker_session, model_data=None, name=None):
+    from sagemaker.tensorflow import TensorFlowModel
 
     # Model artifact location in S3
-    model_data = f"s3://{S3_MODELS_BUCKET_NAME}/{BEST_MODEL}/model.tar.gz"
+    if model_data is None:
+        model_data = f"s3://{S3_MODELS_BUCKET_NAME}/{BEST_MODEL}/model.tar.gz"
 
     # Create SageMaker model
-    tensorflow_model = TensorFlowModel(
+    return TensorFlowModel(
         model_data=model_data,
         role=role,
         framework_version="2.13",
         sagemaker_session=sagemaker_session,
-        name=BEST_MODEL.replace(".", "-").replace(
-            "_", "-"
-        ),  # SageMaker naming requirements
+        name=name
+        or BEST_MODEL.replace(".", "-").replace("_", "-"),  # SageMaker naming requirements
     )
 
+
+def deploy(
+    min_capacity=1,
+    max_capacity=1,
+    target_invocations=100.0,
+    scale_in_cooldown=300,
+    scale_out_cooldown=60,
+    instance_type=DEFAULT_INSTANCE_TYPE,
+    mode="realtime",
+    serverless_memory_mb=2048,
+    serverless_max_concurrency=5,
+    async_max_concurrency=4,
+    sns_success_topic=None,
+    sns_error_topic=None,
+    multi_model_name=None,
+):
+    import sagemaker
+    from sagemaker.serializers import JSONSerializer
+    from sagemaker.deserializers import JSONDeserializer
+    from sagemaker.serverless import ServerlessInferenceConfig
+    from sagemaker.async_inference import AsyncInferenceConfig
+    from sagemaker.multidatamodel import MultiDataModel
+
+    if multi_model_name and mode != "realtime":
+        print("Multi-model endpoints can only be deployed with --mode realtime")
+        return
+
+    # Initialize SageMaker session
+    sagemaker_session = sagemaker.Session()
+
+    role = get_role()
+    if role is None:
+        return
+
+    tensorflow_model = make_tensorflow_model(role, sagemaker_session)
+
     # Deploy model to endpoint
     print("Deploying model to SageMaker endpoint...")
     # Create a timestamped endpoint name to avoid collisions
@@ -165,187 +1282,2133 @@ def deploy():
     endpoint_name = (
         BEST_MODEL.replace(".", "-").replace("_", "-") + f"-endpoint-{ts}"
     )
-    predictor = tensorflow_model.deploy(
-        initial_instance_count=1,
-        instance_type="ml.m5.xlarge",
-        endpoint_name=endpoint_name,
-        serializer=JSONSerializer(),
-        deserializer=JSONDeserializer(),
-    )
+    endpoint_config = {"region": AWS_REGION, "mode": mode}
+    if multi_model_name:
+        # One endpoint for every model under MULTI_MODEL_PREFIX. Models are
+        # loaded on first use and evicted when memory runs low.
+        multi_data_model = MultiDataModel(
+            name=tensorflow_model.name + "-mme",
+            model_data_prefix=MULTI_MODEL_PREFIX,
+            model=tensorflow_model,
+            sagemaker_session=sagemaker_session,
+        )
+        predictor = multi_data_model.deploy(
+            initial_instance_count=min_capacity,
+            instance_type=instance_type,
+            endpoint_name=endpoint_name,
+            serializer=JSONSerializer(),
+            deserializer=JSONDeserializer(),
+        )
+        endpoint_config["instance_type"] = instance_type
+        endpoint_config["multi_model"] = {
+            "model_data_prefix": MULTI_MODEL_PREFIX,
+            "default_target_model": multi_model_name,
+        }
+    elif mode == "serverless":
+        # No instances: pay per request, scaled by SageMaker up to max_concurrency
+        predictor = tensorflow_model.deploy(
+            endpoint_name=endpoint_name,
+            serializer=JSONSerializer(),
+            deserializer=JSONDeserializer(),
+            serverless_inference_config=ServerlessInferenceConfig(
+                memory_size_in_mb=serverless_memory_mb,
+                max_concurrency=serverless_max_concurrency,
+            ),
+        )
+        endpoint_config["serverless"] = {
+            "memory_size_in_mb": serverless_memory_mb,
+            "max_concurrency": serverless_max_concurrency,
+        }
+    else:
+        async_inference_config = None
+        if mode == "async":
+            # Requests are queued and read from S3, results are written to
+            # ASYNC_OUTPUT_PATH and optionally announced on SNS
+            notification_config = {}
+            if sns_success_topic:
+                notification_config["SuccessTopic"] = sns_success_topic
+            if sns_error_topic:
+                notification_config["ErrorTopic"] = sns_error_topic
+            async_inference_config = AsyncInferenceConfig(
+                output_path=ASYNC_OUTPUT_PATH,
+                max_concurrent_invocations_per_instance=async_max_concurrency,
+                notification_config=notification_config or None,
+            )
+            endpoint_config["async"] = {
+                "output_path": ASYNC_OUTPUT_PATH,
+                "input_prefix": ASYNC_INPUT_PREFIX,
+                "max_concurrent_invocations_per_instance": async_max_concurrency,
+                "notification_config": notification_config,
+            }
+        predictor = tensorflow_model.deploy(
+            initial_instance_count=min_capacity,
+            instance_type=instance_type,
+            endpoint_name=endpoint_name,
+            serializer=JSONSerializer(),
+            deserializer=JSONDeserializer(),
+            async_inference_config=async_inference_config,
+        )
+        endpoint_config["instance_type"] = instance_type
 
     print("Model deployed successfully!")
     print(f"Endpoint name: {predictor.endpoint_name}")
     print(f"To invoke the endpoint, use endpoint name: {predictor.endpoint_name}")
 
     # Save endpoint configuration for later use
-    endpoint_config = {"endpoint_name": predictor.endpoint_name, "region": AWS_REGION}
+    endpoint_config["endpoint_name"] = predictor.endpoint_name
+
+    # Scale with load when there is room to scale. Serverless endpoints
+    # scale on their own.
+    if mode != "serverless" and max_capacity > min_capacity:
+        autoscaling = {
+            "min_capacity": min_capacity,
+            "max_capacity": max_capacity,
+            "target_invocations": target_invocations,
+            "scale_in_cooldown": scale_in_cooldown,
+            "scale_out_cooldown": scale_out_cooldown,
+        }
+        configure_autoscaling(predictor.endpoint_name, **autoscaling)
+        endpoint_config["autoscaling"] = autoscaling
 
     with open("endpoint_config.json", "w") as f:
         json.dump(endpoint_config, f, indent=2)
     print("Endpoint configuration saved to endpoint_config.json")
 
 
-def predict():
-    # Load endpoint configuration
-    try:
-        with open("endpoint_config.json", "r") as f:
-            endpoint_config = json.load(f)
-        endpoint_name = endpoint_config["endpoint_name"]
-    except FileNotFoundError:
-        print("Error: endpoint_config.json not found. Please deploy the model first.")
-        print("You can also manually set the endpoint name in the code.")
-        endpoint_name = BEST_MODEL.replace(".", "-").replace("_", "-") + "-endpoint"
+def create_rollback_alarms(
+    endpoint_name,
+    variant_name="AllTraffic",
+    max_p99_latency_ms=1000.0,
+    max_5xx_errors=1,
+    cloudwatch_client=None,
+):
+    # Alarms watched by the blue/green deployment. ModelLatency is reported
+    # in microseconds; both alarms look at one-minute periods.
+    if cloudwatch_client is None:
+        cloudwatch_client = boto3.client("cloudwatch", region_name=AWS_REGION)
+    dimensions = [
+        {"Name": "EndpointName", "Value": endpoint_name},
+        {"Name": "VariantName", "Value": variant_name},
+    ]
+    alarms = {
+        f"{endpoint_name}-p99-latency": {
+            "MetricName": "ModelLatency",
+            "ExtendedStatistic": "p99",
+            "Threshold": max_p99_latency_ms * 1000,
+        },
+        f"{endpoint_name}-5xx-errors": {
+            "MetricName": "Invocation5XXErrors",
+            "Statistic": "Sum",
+            "Threshold": float(max_5xx_errors),
+        },
+    }
+    for alarm_name, metric in alarms.items():
+        cloudwatch_client.put_metric_alarm(
+            AlarmName=alarm_name,
+            Namespace="AWS/SageMaker",
+            Dimensions=dimensions,
+            Period=60,
+            EvaluationPeriods=1,
+            ComparisonOperator="GreaterThanOrEqualToThreshold",
+            TreatMissingData="notBreaching",
+            **metric,
+        )
+    return list(alarms)
 
-    # Build a SageMaker Predictor that speaks JSON
-    predictor = sagemaker.Predictor(
-        endpoint_name=endpoint_name,
-        sagemaker_session=sagemaker.Session(),
-        serializer=JSONSerializer(),
-        deserializer=JSONDeserializer(),
-    )
 
-    # Get a sample image to predict
-    image_files = glob(os.path.join("data", "*.jpg"))
-    image_files.extend(glob(os.path.join("data", "*.jpeg")))
-    print("image_files:", image_files[:5])
+def make_deployment_config(
+    alarm_names,
+    traffic_routing="canary",
+    canary_percent=10,
+    linear_step_percent=20,
+    wait_interval=300,
+    termination_wait=300,
+    max_execution_timeout=None,
+):
+    # Blue/green: the new fleet is provisioned next to the old one, traffic
+    # is shifted in steps of wait_interval seconds while the alarms are
+    # watched, and any alarm firing shifts everything back
+    routing = {
+        "Type": TRAFFIC_ROUTING_TYPES[traffic_routing],
+        "WaitIntervalInSeconds": wait_interval,
+    }
+    if traffic_routing == "canary":
+        routing["CanarySize"] = {"Type": "CAPACITY_PERCENT", "Value": canary_percent}
+    elif traffic_routing == "linear":
+        routing["LinearStepSize"] = {"Type": "CAPACITY_PERCENT", "Value": linear_step_percent}
+    if max_execution_timeout is None:
+        # Every traffic step, the final wait, and an hour for provisioning,
+        # within SageMaker's 600 s to 8 h bounds
+        steps = {"canary": 2, "linear": math.ceil(100 / linear_step_percent)}.get(
+            traffic_routing, 1
+        )
+        max_execution_timeout = steps * wait_interval + termination_wait + 3600
+        max_execution_timeout = min(max(max_execution_timeout, 600), 28800)
+    return {
+        "BlueGreenUpdatePolicy": {
+            "TrafficRoutingConfiguration": routing,
+            "TerminationWaitInSeconds": termination_wait,
+            "MaximumExecutionTimeoutInSeconds": max_execution_timeout,
+        },
+        "AutoRollbackConfiguration": {
+            "Alarms": [{"AlarmName": alarm_name} for alarm_name in alarm_names]
+        },
+    }
 
-    if not image_files:
-        print("No image files found in data directory")
+
+def wait_for_update(endpoint_name, endpoint_config_name, sm_client, poll_seconds=30):
+    # Returns True when the endpoint ends up on endpoint_config_name, False
+    # when the deployment was rolled back or failed
+    while True:
+        endpoint = sm_client.describe_endpoint(EndpointName=endpoint_name)
+        status = endpoint["EndpointStatus"]
+        if status not in ("Updating", "SystemUpdating", "RollingBack"):
+            break
+        print(f"Endpoint {endpoint_name}: {status}")
+        time.sleep(poll_seconds)
+    if status == "InService" and endpoint["EndpointConfigName"] == endpoint_config_name:
+        return True
+    print(f"Endpoint {endpoint_name}: {status}, serving {endpoint['EndpointConfigName']}")
+    if endpoint.get("FailureReason"):
+        print(f"Reason: {endpoint['FailureReason']}")
+    return False
+
+
+def update(
+    model_data=None,
+    instance_type=None,
+    instance_count=None,
+    traffic_routing="canary",
+    canary_percent=10,
+    linear_step_percent=20,
+    wait_interval=300,
+    termination_wait=300,
+    max_p99_latency_ms=1000.0,
+    max_5xx_errors=1,
+):
+    # Move the endpoint in endpoint_config.json to a new model without
+    # changing its name or dropping requests: create a new model and
+    # endpoint config, then let SageMaker shift traffic blue/green
+    import sagemaker
+
+    with open("endpoint_config.json", "r") as f:
+        endpoint_config = json.load(f)
+    endpoint_name = endpoint_config["endpoint_name"]
+    if endpoint_config.get("mode", "realtime") != "realtime" or "multi_model" in endpoint_config:
+        print("Blue/green updates need a single-model --mode realtime endpoint")
+        return
+
+    sagemaker_session = sagemaker.Session()
+    sm_client = sagemaker_session.sagemaker_client
+    s3_client = boto3.client("s3", region_name=AWS_REGION)
+    role = get_role()
+    if role is None:
         return
 
-    image_samples = np.random.randint(0, high=len(image_files), size=min(5, len(image_files)))
-    for img_idx in image_samples:
-        img_path = image_files[img_idx]
-        print("Image:", img_path)
+    # The instances currently serving, unless overridden. The count comes
+    # from the endpoint, since autoscaling may have grown the fleet past the
+    # config's initial count.
+    endpoint = sm_client.describe_endpoint(EndpointName=endpoint_name)
+    current_config = sm_client.describe_endpoint_config(
+        EndpointConfigName=endpoint["EndpointConfigName"]
+    )
+    current_variant = current_config["ProductionVariants"][0]
+    variant_name = current_variant["VariantName"]
+    instance_type = instance_type or current_variant["InstanceType"]
+    instance_count = (
+        instance_count or endpoint["ProductionVariants"][0]["CurrentInstanceCount"]
+    )
 
-        with Image.open(img_path) as img:
-            img = img.convert("RGB").resize((224, 224))
-            arr = np.asarray(img, dtype=np.float32) / 255.0
+    # Pin the release to its own copy of the artifact, so neither fleet
+    # loads a model.tar.gz that a later --prepare overwrote
+    ts = datetime.utcnow().strftime("%Y%m%d%H%M%S")
+    if model_data is None:
+        release_key = f"{BEST_MODEL}/releases/{ts}/model.tar.gz"
+        s3_client.copy(
+            {"Bucket": S3_MODELS_BUCKET_NAME, "Key": f"{BEST_MODEL}/model.tar.gz"},
+            S3_MODELS_BUCKET_NAME,
+            release_key,
+        )
+        model_data = f"s3://{S3_MODELS_BUCKET_NAME}/{release_key}"
 
-        payload = {"instances": [arr.tolist()]}
+    model_name = BEST_MODEL.replace(".", "-").replace("_", "-") + f"-{ts}"
+    tensorflow_model = make_tensorflow_model(
+        role, sagemaker_session, model_data=model_data, name=model_name
+    )
+    tensorflow_model.create(instance_type=instance_type)
+    print(f"Created model {model_name} from {model_data}")
 
-        try:
-            result = predictor.predict(payload)
-            print("Result:", result)
-            if "predictions" in result:
-                prediction = result["predictions"][0]
-                prediction_index = int(np.argmax(prediction))
-                print(prediction, prediction_index)
-                print("Label:   ", data_details["index2label"][str(prediction_index)], "\n")
-            else:
-                print("Unexpected response format:", result)
-        except Exception as e:
-            print(f"Error invoking endpoint: {e}")
-            print(f"Make sure the endpoint '{endpoint_name}' exists and is in service")
+    # Same variant name, so autoscaling and the alarms keep applying
+    new_config_name = f"{endpoint_name}-{ts}"
+    sm_client.create_endpoint_config(
+        EndpointConfigName=new_config_name,
+        ProductionVariants=[
+            {
+                "VariantName": variant_name,
+                "ModelName": model_name,
+                "InitialInstanceCount": instance_count,
+                "InstanceType": instance_type,
+            }
+        ],
+    )
 
+    alarm_names = create_rollback_alarms(
+        endpoint_name,
+        variant_name=variant_name,
+        max_p99_latency_ms=max_p99_latency_ms,
+        max_5xx_errors=max_5xx_errors,
+    )
+    deployment_config = make_deployment_config(
+        alarm_names,
+        traffic_routing=traffic_routing,
+        canary_percent=canary_percent,
+        linear_step_percent=linear_step_percent,
+        wait_interval=wait_interval,
+        termination_wait=termination_wait,
+    )
+    # UpdateEndpoint refuses to change the instance type of an autoscaled
+    # variant, so its scaling is taken off for the update and put back on
+    # whichever fleet ends up serving
+    saved_autoscaling = None
+    if instance_type != current_variant["InstanceType"]:
+        saved_autoscaling = save_autoscaling(endpoint_name, variant_name)
+        if saved_autoscaling:
+            remove_autoscaling(endpoint_name, variant_name)
 
-def delete():
-    # Load endpoint configuration if present
-    endpoint_name = None
     try:
-        with open("endpoint_config.json", "r") as f:
-            endpoint_config = json.load(f)
-            endpoint_name = endpoint_config.get("endpoint_name")
-    except FileNotFoundError:
-        pass
+        print(f"Updating {endpoint_name} to {new_config_name} ({traffic_routing})")
+        sm_client.update_endpoint(
+            EndpointName=endpoint_name,
+            EndpointConfigName=new_config_name,
+            DeploymentConfig=deployment_config,
+        )
 
-    sm_client = boto3.client("sagemaker", region_name=AWS_REGION)
-    s3_client = boto3.client("s3", region_name=AWS_REGION)
+        # Record what was created so --delete can clean it up, whatever happens
+        endpoint_config.setdefault("models", []).append(model_name)
+        endpoint_config["alarms"] = alarm_names
+        with open("endpoint_config.json", "w") as f:
+            json.dump(endpoint_config, f, indent=2)
 
-    # Delete endpoint
-    if endpoint_name:
-        try:
-            print(f"Deleting endpoint: {endpoint_name}")
-            sm_client.delete_endpoint(EndpointName=endpoint_name)
-        except ClientError as e:
-            print(f"Warning: could not delete endpoint {endpoint_name}: {e}")
+        if wait_for_update(endpoint_name, new_config_name, sm_client):
+            print(f"Endpoint {endpoint_name} now serves {model_name}")
+            endpoint_config["model_name"] = model_name
+            endpoint_config["model_data"] = model_data
+            endpoint_config["instance_type"] = instance_type
+            with open("endpoint_config.json", "w") as f:
+                json.dump(endpoint_config, f, indent=2)
+        else:
+            print(f"Update rolled back, {endpoint_name} kept serving the previous model")
+    finally:
+        if saved_autoscaling:
+            restore_autoscaling(saved_autoscaling)
 
-    # Try to derive endpoint-config and model names from our naming scheme
-    model_name = BEST_MODEL.replace(".", "-").replace("_", "-")
-    endpoint_config_name = None
 
-    # Best-effort: list endpoint configs and delete ones referencing our model
-    try:
-        paginator = sm_client.get_paginator("list_endpoint_configs")
-        for page in paginator.paginate():
-            for ec in page.get("EndpointConfigs", []):
-                name = ec.get("EndpointConfigName", "")
-                if model_name in name:
-                    endpoint_config_name = name
-                    print(f"Deleting endpoint config: {endpoint_config_name}")
-                    try:
-                        sm_client.delete_endpoint_config(EndpointConfigName=endpoint_config_name)
-                    except ClientError as e:
-                        print(f"Warning: could not delete endpoint config {endpoint_config_name}: {e}")
-    except ClientError as e:
-        print(f"Warning: list_endpoint_configs failed: {e}")
-
-    # Delete model
-    try:
-        print(f"Deleting model: {model_name}")
-        sm_client.delete_model(ModelName=model_name)
-    except ClientError as e:
-        print(f"Warning: could not delete model {model_name}: {e}")
+def split_s3_uri(uri):
+    bucket, _, prefix = uri[len("s3://"):].partition("/")
+    return bucket, prefix
 
-    # Delete S3 artifacts under BEST_MODEL/
-    prefix = f"{BEST_MODEL}/"
-    try:
-        print(f"Deleting S3 artifacts s3://{S3_MODELS_BUCKET_NAME}/{prefix}")
+
+def list_images(source, s3_client=None):
+    # Lazily yield image keys under a local directory or an S3 prefix, in a
+    # stable order so that a crashed run can be resumed by position
+    if source.startswith("s3://"):
+        bucket, prefix = split_s3_uri(source)
         paginator = s3_client.get_paginator("list_objects_v2")
-        to_delete = []
-        for page in paginator.paginate(Bucket=S3_MODELS_BUCKET_NAME, Prefix=prefix):
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
             for obj in page.get("Contents", []):
-                to_delete.append({"Key": obj["Key"]})
-                if len(to_delete) == 1000:
-                    s3_client.delete_objects(Bucket=S3_MODELS_BUCKET_NAME, Delete={"Objects": to_delete})
-                    to_delete = []
-        if to_delete:
-            s3_client.delete_objects(Bucket=S3_MODELS_BUCKET_NAME, Delete={"Objects": to_delete})
-    except ClientError as e:
-        print(f"Warning: could not delete S3 artifacts: {e}")
-    
-    # Remove local endpoint_config.json
-    try:
-        os.remove("endpoint_config.json")
-        print("Removed endpoint_config.json")
-    except FileNotFoundError:
-        pass
+                if obj["Key"].lower().endswith(IMAGE_EXTENSIONS):
+                    yield f"s3://{bucket}/{obj['Key']}"
+    else:
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    yield os.path.join(root, name)
 
 
-def main(args=None):
+def read_image_bytes(key, s3_client=None):
+    if key.startswith("s3://"):
+        bucket, obj_key = split_s3_uri(key)
+        return s3_client.get_object(Bucket=bucket, Key=obj_key)["Body"].read()
+    with open(key, "rb") as f:
+        return f.read()
 
-    if args.prepare:
-        print("Prepare model and save model to GCS Bucket")
-        prepare()
 
-    elif args.deploy:
-        print("Deploy model")
-        deploy()
+def write_object_bytes(key, data, s3_client=None):
+    if key.startswith("s3://"):
+        bucket, obj_key = split_s3_uri(key)
+        s3_client.put_object(Bucket=bucket, Key=obj_key, Body=data)
+        return
+    os.makedirs(os.path.dirname(key), exist_ok=True)
+    with open(key, "wb") as f:
+        f.write(data)
 
-    elif args.predict:
-        print("Predict using endpoint")
-        predict()
 
-    elif args.delete:
-        print("Delete endpoint, model, and S3 artifacts")
-        delete()
+def result_row(key, prediction=None, error=None):
+    # One row of --score / --transform output
+    import numpy as np
 
+    if error is not None:
+        return {"key": key, "label": None, "predictions": None, "error": str(error)}
+    prediction = [float(p) for p in prediction]
+    prediction_index = int(np.argmax(prediction))
+    return {
+        "key": key,
+        "label": data_details["index2label"][str(prediction_index)],
+        "predictions": prediction,
+        "error": None,
+    }
 
-if __name__ == "__main__":
-    # Generate the inputs arguments parser
-    # if you type into the terminal 'python cli.py --help', it will provide the description
-    parser = argparse.ArgumentParser(description="Data Collector CLI")
 
-    parser.add_argument(
-        "--prepare",
-        action="store_true",
-        help="Prepare model and save model to GCS Bucket",
-    )
-    parser.add_argument(
-        "--deploy",
-        action="store_true",
-        help="Deploy saved model to Vertex AI",
-    )
+class JsonlResultWriter:
+    # Appends one JSON object per line. The checkpoint stores the byte offset
+    # of the last durable line, so a resumed run first truncates any partial
+    # tail written after it.
+    def __init__(self, path, checkpoint=None):
+        self.path = path
+        self.completed = 0
+        self.last_key = None
+        offset = 0
+        if checkpoint:
+            self.completed = checkpoint["completed"]
+            self.last_key = checkpoint["last_key"]
+            offset = checkpoint["offset"]
+        self.f = open(path, "r+b" if checkpoint else "wb")
+        self.f.truncate(offset)
+        self.f.seek(offset)
+        self.offset = offset
+
+    def write(self, rows):
+        for row in rows:
+            self.f.write((json.dumps(row) + "\n").encode("utf-8"))
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        self.offset = self.f.tell()
+        self.completed += len(rows)
+        self.last_key = rows[-1]["key"]
+
+    def state(self):
+        return {
+            "completed": self.completed,
+            "last_key": self.last_key,
+            "offset": self.offset,
+        }
+
+    def close(self):
+        self.f.close()
+
+
+class ParquetResultWriter:
+    # Writes numbered part files under the output directory. Rows only count
+    # as completed once their part file is closed, so a crash re-scores at
+    # most rows_per_file images.
+    def __init__(self, path, checkpoint=None, rows_per_file=10000):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("Parquet output requires pyarrow: pip install pyarrow")
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+        self.path = path
+        self.rows_per_file = rows_per_file
+        self.rows = []
+        self.completed = 0
+        self.last_key = None
+        self.parts = 0
+        if checkpoint:
+            self.completed = checkpoint["completed"]
+            self.last_key = checkpoint["last_key"]
+            self.parts = checkpoint["parts"]
+        os.makedirs(path, exist_ok=True)
+
+    def write(self, rows):
+        self.rows.extend(rows)
+        if len(self.rows) >= self.rows_per_file:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        part_path = os.path.join(self.path, f"part-{self.parts:05d}.parquet")
+        self.pq.write_table(self.pa.Table.from_pylist(self.rows), part_path)
+        self.parts += 1
+        self.completed += len(self.rows)
+        self.last_key = self.rows[-1]["key"]
+        self.rows = []
+
+    def state(self):
+        return {
+            "completed": self.completed,
+            "last_key": self.last_key,
+            "parts": self.parts,
+        }
+
+    def close(self):
+        self.flush()
+
+
+def save_checkpoint(checkpoint_path, state):
+    # Write to a temporary file first so a crash never leaves a torn checkpoint
+    with open(checkpoint_path + ".tmp", "w") as f:
+        json.dump(state, f)
+    os.replace(checkpoint_path + ".tmp", checkpoint_path)
+
+
+def score(
+    source,
+    output,
+    payload_format="json",
+    batch_size=16,
+    max_payload_bytes=MAX_PAYLOAD_BYTES,
+    concurrency=4,
+    decode_workers=4,
+    timeout=INVOKE_TIMEOUT_SECONDS,
+    resume=True,
+    backend="sagemaker",
+    target_model=None,
+    tflite_threads=None,
+    onnx_threads=None,
+    async_timeout=ASYNC_TIMEOUT_SECONDS,
+):
+    # Stream every image under source through batch -> decode -> invoke ->
+    # write (decode -> batch for jpeg). Each stage keeps only a bounded
+    # window of work in memory.
+    predictor = make_backend_predictor(
+        backend,
+        payload_format,
+        concurrency=concurrency,
+        timeout=timeout,
+        target_model=target_model,
+        tflite_threads=tflite_threads,
+        onnx_threads=onnx_threads,
+        async_timeout=async_timeout,
+    )
+    max_payload_bytes = cap_payload_bytes(max_payload_bytes, backend)
+    s3_client = boto3.client(
+        "s3",
+        region_name=AWS_REGION,
+        config=Config(max_pool_connections=max(10, decode_workers)),
+    )
+
+    # Pick up where a previous run of the same command stopped
+    checkpoint_path = output + ".checkpoint.json"
+    checkpoint = None
+    if resume and os.path.exists(checkpoint_path):
+        with open(checkpoint_path, "r") as f:
+            checkpoint = json.load(f)
+        if checkpoint.get("finished"):
+            print(
+                f"{output} is already complete ({checkpoint['completed']} images), "
+                "run again with --no-resume to score everything again"
+            )
+            return
+        print(f"Resuming after {checkpoint['completed']} images ({checkpoint['last_key']})")
+
+    if output.endswith(".jsonl"):
+        writer = JsonlResultWriter(output, checkpoint)
+    else:
+        writer = ParquetResultWriter(output, checkpoint)
+
+    keys = list_images(source, s3_client)
+    if checkpoint and checkpoint["completed"] > 0:
+        # Skip the completed prefix of the listing, checking it still ends
+        # at the key the checkpoint recorded. Only the last key is kept, so
+        # memory stays bounded however far the run got.
+        skipped = 0
+        last_key = None
+        for last_key in islice(keys, checkpoint["completed"]):
+            skipped += 1
+        if skipped != checkpoint["completed"] or last_key != checkpoint["last_key"]:
+            writer.close()
+            raise RuntimeError(
+                "Input listing changed since the checkpoint, "
+                "run again with --no-resume to start over"
+            )
+
+    def decode(key):
+        try:
+            img_file = io.BytesIO(read_image_bytes(key, s3_client))
+            return key, load_instance(img_file, payload_format), None
+        except Exception as e:
+            return key, None, e
+
+    def decode_batch(keys):
+        # Decode a batch of keys into one preallocated array, packing the
+        # images that decoded at the front
+        images = new_batch(len(keys), payload_format)
+        batch = []
+        decoded = 0
+        for key in keys:
+            try:
+                img_file = io.BytesIO(read_image_bytes(key, s3_client))
+                load_instance(img_file, payload_format, out=images[decoded])
+                decoded += 1
+                batch.append((key, None, None))
+            except Exception as e:
+                batch.append((key, None, e))
+        return batch, images[:decoded]
+
+    if payload_format == "jpeg":
+        # Batches are sized by the encoded files, so those are read first
+        batches = (
+            (batch, [arr for _, arr, error in batch if error is None])
+            for batch in make_batches(
+                ordered_map(decode, keys, decode_workers),
+                max_batch_size=batch_size,
+                max_payload_bytes=max_payload_bytes,
+                item_bytes=lambda item: (
+                    0 if item[1] is None else estimate_payload_bytes(item[1], payload_format)
+                ),
+            )
+        )
+    else:
+        # Every image decodes to the same shape, so keys are batched up
+        # front and each batch is decoded straight into its request array
+        instance_bytes = estimate_payload_bytes(new_batch(1, payload_format)[0], payload_format)
+        key_batches = make_batches(
+            keys,
+            max_batch_size=batch_size,
+            max_payload_bytes=max_payload_bytes,
+            item_bytes=lambda key: instance_bytes,
+        )
+        batches = ordered_map(decode_batch, key_batches, decode_workers)
+
+    def invoke(batch_images):
+        batch, images = batch_images
+        if len(images) == 0:
+            return batch, None, None
+        try:
+            result = predictor.predict(build_payload(images, payload_format))
+        except Exception as e:
+            return batch, None, e
+        # A response without one prediction per image cannot be matched
+        # back to the keys, so the whole batch is reported as failed
+        predictions = parse_predictions(result)
+        if predictions is None or len(predictions) != len(images):
+            count = "no" if predictions is None else len(predictions)
+            return batch, None, ValueError(
+                f"Expected {len(images)} predictions, response had {count}"
+            )
+        return batch, predictions, None
+
+    scored = 0
+    start = time.time()
+    finished = False
+    try:
+        for batch, predictions, error in ordered_map(invoke, batches, concurrency):
+            rows = []
+            predictions = iter(predictions if predictions is not None else [])
+            for key, arr, decode_error in batch:
+                if decode_error is not None or error is not None:
+                    rows.append(result_row(key, error=decode_error or error))
+                    continue
+                rows.append(result_row(key, next(predictions)))
+            writer.write(rows)
+            # Record progress only after the rows are durable
+            save_checkpoint(checkpoint_path, writer.state())
+
+            scored += len(rows)
+            if scored % 1000 < len(rows):
+                print(f"Scored {scored} images ({scored / (time.time() - start):.1f} images/s)")
+        finished = True
+    finally:
+        writer.close()
+        # A finished checkpoint stops a rerun from silently scoring nothing
+        save_checkpoint(checkpoint_path, dict(writer.state(), finished=finished))
+
+    print(f"Scored {scored} images in {time.time() - start:.1f}s, results in {output}")
+
+
+class SageMakerTransformRunner:
+    # Runs a Batch Transform job with the model deployed by deploy(). Each
+    # input object becomes a <key>.out object holding the endpoint's JSON
+    # response under output_prefix, mirroring the input layout.
+    #
+    # Every input object is a single encoded image, so the job neither
+    # splits objects into records nor batches records into one request:
+    # an image cannot be split, and a MultiRecord response would hold the
+    # predictions of several images in one .out with no way to map them
+    # back to their keys.
+    def __init__(
+        self,
+        instance_type=DEFAULT_INSTANCE_TYPE,
+        instance_count=1,
+        max_payload_mb=6,
+        max_concurrent_transforms=4,
+    ):
+        self.instance_type = instance_type
+        self.instance_count = instance_count
+        self.max_payload_mb = max_payload_mb
+        self.max_concurrent_transforms = max_concurrent_transforms
+
+    def run(self, input_prefix, output_prefix):
+        import sagemaker
+
+        role = get_role()
+        if role is None:
+            raise RuntimeError("No SageMaker execution role")
+        tensorflow_model = make_tensorflow_model(role, sagemaker.Session())
+        transformer = tensorflow_model.transformer(
+            instance_count=self.instance_count,
+            instance_type=self.instance_type,
+            strategy="SingleRecord",
+            max_payload=self.max_payload_mb,
+            max_concurrent_transforms=self.max_concurrent_transforms,
+            output_path=output_prefix,
+            accept="application/json",
+        )
+        transformer.transform(
+            data=input_prefix,
+            data_type="S3Prefix",
+            content_type=TRANSFORM_CONTENT_TYPE,
+            split_type=None,
+            wait=True,
+            logs=False,
+        )
+        print(f"Transform job {transformer.latest_transform_job.name} completed")
+
+
+class LocalTransformRunner:
+    # Stand-in for SageMakerTransformRunner that scores each input with the
+    # local SavedModel and writes the same <key>.out layout, locally or to S3
+    def __init__(self, model_path=LOCAL_MODEL_PATH, max_concurrent_transforms=4, s3_client=None):
+        self.model_path = model_path
+        self.max_concurrent_transforms = max_concurrent_transforms
+        self.s3_client = s3_client
+
+    def run(self, input_prefix, output_prefix):
+        from sagemaker.serializers import DataSerializer
+        from sagemaker.deserializers import JSONDeserializer
+
+        predictor = LocalPredictor(
+            self.model_path,
+            DataSerializer(content_type=TRANSFORM_CONTENT_TYPE),
+            JSONDeserializer(),
+        )
+
+        def transform_one(key):
+            result = predictor.predict(read_image_bytes(key, self.s3_client))
+            output_key = transform_output_key(key, input_prefix, output_prefix)
+            write_object_bytes(output_key, json.dumps(result).encode("utf-8"), self.s3_client)
+
+        for _ in ordered_map(
+            transform_one,
+            list_images(input_prefix, self.s3_client),
+            self.max_concurrent_transforms,
+        ):
+            pass
+
+
+def transform_output_key(key, input_prefix, output_prefix):
+    # Batch Transform keeps the path below the input prefix and appends .out
+    relative = key[len(input_prefix):].lstrip("/")
+    if output_prefix.startswith("s3://"):
+        return f"{output_prefix.rstrip('/')}/{relative}.out"
+    return os.path.join(output_prefix, relative + ".out")
+
+
+def transform(
+    source,
+    output,
+    output_prefix=None,
+    instance_type=DEFAULT_INSTANCE_TYPE,
+    instance_count=1,
+    max_payload_mb=6,
+    max_concurrent_transforms=4,
+    backend="sagemaker",
+    runner=None,
+):
+    # Score every image under source with a Batch Transform job instead of
+    # per-request invocations, then join the job's outputs back to the
+    # input keys and write them like --score does
+    if backend in ("tflite", "onnx"):
+        raise ValueError("Batch Transform runs the SavedModel, use the local or sagemaker backend")
+    s3_client = boto3.client("s3", region_name=AWS_REGION)
+    if runner is None:
+        if backend == "local":
+            runner = LocalTransformRunner(
+                max_concurrent_transforms=max_concurrent_transforms, s3_client=s3_client
+            )
+        else:
+            if not source.startswith("s3://"):
+                raise ValueError("Batch Transform input must be an s3:// prefix")
+            runner = SageMakerTransformRunner(
+                instance_type=instance_type,
+                instance_count=instance_count,
+                max_payload_mb=max_payload_mb,
+                max_concurrent_transforms=max_concurrent_transforms,
+            )
+    if output_prefix is None:
+        ts = datetime.utcnow().strftime("%Y%m%d%H%M%S")
+        if backend == "local" and not source.startswith("s3://"):
+            output_prefix = os.path.join("artifacts", "transform-output", ts)
+        else:
+            output_prefix = f"{TRANSFORM_OUTPUT_PREFIX}/{ts}"
+
+    start = time.time()
+    print(f"Transforming {source} into {output_prefix}")
+    runner.run(source, output_prefix)
+    print(f"Transform finished in {time.time() - start:.1f}s")
+
+    # Inputs without an output (e.g. a failed record), or whose output does
+    # not hold exactly one prediction, are reported as errors
+    def collect(key):
+        try:
+            body = read_image_bytes(
+                transform_output_key(key, source, output_prefix), s3_client
+            )
+            predictions = json.loads(body)["predictions"]
+            if len(predictions) != 1:
+                raise ValueError(f"Expected 1 prediction, output had {len(predictions)}")
+            return [result_row(key, predictions[0])]
+        except Exception as e:
+            return [result_row(key, error=e)]
+
+    if output.endswith(".jsonl"):
+        writer = JsonlResultWriter(output)
+    else:
+        writer = ParquetResultWriter(output)
+    joined = 0
+    try:
+        for rows in ordered_map(collect, list_images(source, s3_client), concurrency=8):
+            writer.write(rows)
+            joined += len(rows)
+    finally:
+        writer.close()
+    print(f"Joined {joined} results into {output}")
+
+
+class TFServingPredictor:
+    # Predictor for a plain TF Serving REST API, e.g. the tensorflow/serving
+    # container started by --rightsize-local. Only JSON payload formats are
+    # supported since the SageMaker request handlers are not in the path.
+    def __init__(self, url, serializer, deserializer, timeout=INVOKE_TIMEOUT_SECONDS):
+        import requests
+
+        if serializer.CONTENT_TYPE != "application/json":
+            raise ValueError(
+                f"TF Serving only accepts JSON payloads, not {serializer.CONTENT_TYPE}"
+            )
+        self.endpoint_name = url
+        self.serializer = serializer
+        self.deserializer = deserializer
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def predict(self, data):
+        r = self.session.post(
+            self.endpoint_name,
+            data=self.serializer.serialize(data),
+            headers={"Content-Type": self.serializer.CONTENT_TYPE},
+            timeout=self.timeout,
+        )
+        r.raise_for_status()
+        return self.deserializer.deserialize(io.BytesIO(r.content), "application/json")
+
+
+def start_local_serving(instance_type, port=8501):
+    # Run tensorflow/serving with the CPU and memory of instance_type
+    import requests
+
+    spec = INSTANCE_TYPES[instance_type]
+    container = subprocess.run(
+        [
+            "docker", "run", "-d", "--rm",
+            "-p", f"{port}:8501",
+            "--cpus", str(spec["vcpus"]),
+            "--memory", f"{spec['memory_gb']}g",
+            "-v", f"{os.path.abspath(os.path.dirname(LOCAL_MODEL_PATH))}:/models/model",
+            "-e", "MODEL_NAME=model",
+            "tensorflow/serving:2.13.1",
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.strip()
+
+    # Wait for the model to load
+    url = f"http://localhost:{port}/v1/models/model"
+    for _ in range(60):
+        try:
+            r = requests.get(url, timeout=2)
+            if r.ok and any(
+                status.get("state") == "AVAILABLE"
+                for status in r.json().get("model_version_status", [])
+            ):
+                return container, url + ":predict"
+        except (requests.RequestException, ValueError):
+            pass
+        time.sleep(2)
+    subprocess.run(["docker", "stop", container], capture_output=True)
+    raise RuntimeError(f"Model did not become AVAILABLE in TF Serving on {instance_type}")
+
+
+def delete_candidate_endpoint(sm_client, endpoint_name):
+    # Delete a --rightsize endpoint and its endpoint config, which deploy()
+    # names after the endpoint. Works whether or not the deploy succeeded.
+    for delete_fn, kwargs in (
+        (sm_client.delete_endpoint, {"EndpointName": endpoint_name}),
+        (sm_client.delete_endpoint_config, {"EndpointConfigName": endpoint_name}),
+    ):
+        try:
+            delete_fn(**kwargs)
+        except ClientError as e:
+            print(f"Warning: could not clean up {endpoint_name}: {e}")
+
+
+def find_max_throughput(predictor, payload, target_p99_ms, duration=30, warmup=5):
+    # Raise concurrency until p99 latency goes over target_p99_ms or
+    # requests start failing; the last passing step is the capacity
+    best = None
+    steps = []
+    for concurrency in (1, 2, 4, 8, 16, 32, 64):
+        report = run_load_test(
+            lambda: predictor.predict(payload),
+            concurrency=concurrency,
+            duration=duration,
+            warmup=warmup,
+        )
+        p99 = report["latency_ms"].get("p99")
+        steps.append({"concurrency": concurrency, "p99_ms": p99, **report})
+        print(
+            f"  concurrency {concurrency}: {report['throughput_rps']:.1f} requests/s, "
+            f"p99 {p99 if p99 is None else round(p99, 1)} ms, errors {report['error_rate']:.2%}"
+        )
+        if p99 is None or p99 > target_p99_ms or report["error_rate"] > 0.01:
+            break
+        if best is None or report["throughput_rps"] > best["throughput_rps"]:
+            best = steps[-1]
+    return best, steps
+
+
+def rightsize(
+    instance_types,
+    target_p99_ms=200.0,
+    payload_format="json",
+    batch_size=1,
+    duration=30,
+    local=False,
+    prices_path=None,
+    report_path="rightsize_report.json",
+):
+    # Load test the model on each candidate instance type and report the cost
+    # per 1M inferences at the highest throughput that meets target_p99_ms
+    import sagemaker
+
+    prices = {name: spec["price_per_hour"] for name, spec in INSTANCE_TYPES.items()}
+    if prices_path:
+        with open(prices_path, "r") as f:
+            prices.update(json.load(f))
+
+    image_files = sample_image_files()
+    if not image_files:
+        print("No image files found in data directory")
+        return
+    instances = [
+        load_instance(image_files[i % len(image_files)], payload_format)
+        for i in range(batch_size)
+    ]
+    payload = build_payload(instances, payload_format)
+
+    if local:
+        # Fail before starting any container
+        if PAYLOAD_CONTENT_TYPES[payload_format][0] != "application/json":
+            raise ValueError(f"--rightsize-local needs a JSON payload format, not {payload_format}")
+    else:
+        sagemaker_session = sagemaker.Session()
+        role = get_role()
+        if role is None:
+            return
+        tensorflow_model = make_tensorflow_model(role, sagemaker_session)
+        sm_client = boto3.client("sagemaker", region_name=AWS_REGION)
+
+    results = []
+    for instance_type in instance_types:
+        print(f"Load testing {instance_type}")
+        container = None
+        endpoint_name = BEST_MODEL.replace(".", "-").replace("_", "-") + "-rs-" + (
+            instance_type.replace("ml.", "").replace(".", "-")
+        )
+        try:
+            if local:
+                container, url = start_local_serving(instance_type)
+                serializer, deserializer = PAYLOAD_FORMATS[payload_format]()
+                predictor = TFServingPredictor(url, serializer, deserializer)
+            else:
+                tensorflow_model.deploy(
+                    initial_instance_count=1,
+                    instance_type=instance_type,
+                    endpoint_name=endpoint_name,
+                )
+                # Same client as --predict and --bench, so the latencies match
+                predictor = EndpointPredictor(endpoint_name, payload_format, concurrency=64)
+            best, steps = find_max_throughput(
+                predictor, payload, target_p99_ms, duration=duration
+            )
+        finally:
+            # Never leave a candidate running, even if its deploy failed
+            if local:
+                if container:
+                    subprocess.run(["docker", "stop", container], capture_output=True)
+            else:
+                delete_candidate_endpoint(sm_client, endpoint_name)
+
+        result = {
+            "instance_type": instance_type,
+            "price_per_hour": prices.get(instance_type),
+            "steps": steps,
+        }
+        if best and prices.get(instance_type) is not None:
+            images_per_s = best["throughput_rps"] * batch_size
+            result.update(
+                {
+                    "concurrency": best["concurrency"],
+                    "images_per_s": images_per_s,
+                    "p99_ms": best["p99_ms"],
+                    "cost_per_1m": prices[instance_type] / (images_per_s * 3600) * 1e6,
+                }
+            )
+        results.append(result)
+
+    print(f"{'instance':<16} {'$/hour':>7} {'images/s':>9} {'p99 ms':>7} {'$/1M':>8}")
+    for result in results:
+        if "cost_per_1m" in result:
+            print(
+                f"{result['instance_type']:<16} {result['price_per_hour']:>7.3f} "
+                f"{result['images_per_s']:>9.1f} {result['p99_ms']:>7.1f} "
+                f"{result['cost_per_1m']:>8.2f}"
+            )
+        else:
+            print(f"{result['instance_type']:<16} did not meet p99 <= {target_p99_ms} ms")
+
+    candidates = [result for result in results if "cost_per_1m" in result]
+    recommended = min(candidates, key=lambda r: r["cost_per_1m"]) if candidates else None
+    if recommended:
+        print(f"Recommended: {recommended['instance_type']}")
+
+    report = {
+        "target_p99_ms": target_p99_ms,
+        "payload_format": payload_format,
+        "batch_size": batch_size,
+        "backend": "local" if local else "sagemaker",
+        "recommended": recommended["instance_type"] if recommended else None,
+        "results": results,
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+    }
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report saved to {report_path}")
+    return report
+
+
+def bench(
+    payload_format="json",
+    batch_size=1,
+    rps=None,
+    concurrency=1,
+    duration=60,
+    warmup=5,
+    timeout=INVOKE_TIMEOUT_SECONDS,
+    backend="sagemaker",
+    report_path="bench_report.json",
+    target_model=None,
+    tflite_threads=None,
+    onnx_threads=None,
+    async_timeout=ASYNC_TIMEOUT_SECONDS,
+):
+    # Drive the endpoint (or the local backend) with a fixed request and
+    # write a JSON latency/throughput report
+    predictor = make_backend_predictor(
+        backend,
+        payload_format,
+        concurrency=concurrency,
+        timeout=timeout,
+        target_model=target_model,
+        tflite_threads=tflite_threads,
+        onnx_threads=onnx_threads,
+        async_timeout=async_timeout,
+    )
+
+    image_files = sample_image_files()
+    if not image_files:
+        print("No image files found in data directory")
+        return
+
+    instances = [
+        load_instance(image_files[i % len(image_files)], payload_format)
+        for i in range(batch_size)
+    ]
+    payload = build_payload(instances, payload_format)
+
+    mode = f"{rps} requests/s" if rps else f"concurrency {concurrency}"
+    print(f"Benchmarking {predictor.endpoint_name} at {mode} for {duration}s")
+    report = run_load_test(
+        lambda: predictor.predict(payload),
+        rps=rps,
+        concurrency=concurrency,
+        duration=duration,
+        warmup=warmup,
+    )
+    report.update(
+        {
+            "endpoint_name": predictor.endpoint_name,
+            "backend": backend,
+            "payload_format": payload_format,
+            "batch_size": batch_size,
+            "images_per_s": report["throughput_rps"] * batch_size,
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+        }
+    )
+
+    latency = report["latency_ms"]
+    print(
+        f"Requests: {report['requests']}, errors: {report['errors']} "
+        f"({report['error_rate']:.2%})"
+    )
+    print(
+        f"Throughput: {report['throughput_rps']:.1f} requests/s, "
+        f"{report['images_per_s']:.1f} images/s"
+    )
+    if latency:
+        print(
+            f"Latency ms: p50 {latency['p50']:.1f}, p90 {latency['p90']:.1f}, "
+            f"p99 {latency['p99']:.1f}, p99.9 {latency['p99.9']:.1f}, max {latency['max']:.1f}"
+        )
+
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report saved to {report_path}")
+    return report
+
+
+def model_latency(
+    models=None,
+    payload_format="json",
+    warm_requests=10,
+    timeout=INVOKE_TIMEOUT_SECONDS,
+    report_path="model_latency_report.json",
+):
+    # For each model of the multi-model endpoint, time the first request,
+    # which includes downloading and loading the model unless it is already
+    # cached on the instance, against the median of the requests after it
+    import numpy as np
+
+    endpoint_config = load_endpoint_config()
+    if "multi_model" not in endpoint_config:
+        print("The endpoint in endpoint_config.json is not a multi-model endpoint")
+        return
+    image_files = sample_image_files()
+    if not image_files:
+        print("No image files found in data directory")
+        return
+    predictor = EndpointPredictor(
+        endpoint_config["endpoint_name"], payload_format, timeout=timeout
+    )
+    models = models or list_multi_models()
+
+    payload = build_payload([load_instance(image_files[0], payload_format)], payload_format)
+
+    results = []
+    for model in models:
+        target = TargetModelPredictor(predictor, model)
+        try:
+            start = time.perf_counter()
+            target.predict(payload)
+            first_ms = (time.perf_counter() - start) * 1000
+            latencies = []
+            for _ in range(warm_requests):
+                start = time.perf_counter()
+                target.predict(payload)
+                latencies.append((time.perf_counter() - start) * 1000)
+        except Exception as e:
+            print(f"{model}: {e}")
+            results.append({"model": model, "error": str(e)})
+            continue
+        warm_ms = float(np.median(latencies))
+        results.append(
+            {
+                "model": model,
+                "first_request_ms": first_ms,
+                "warm_p50_ms": warm_ms,
+                "load_ms": max(0.0, first_ms - warm_ms),
+            }
+        )
+
+    print(f"{'model':<40} {'first ms':>9} {'warm ms':>8} {'load ms':>8}")
+    for result in results:
+        if "error" in result:
+            continue
+        print(
+            f"{result['model']:<40} {result['first_request_ms']:>9.1f} "
+            f"{result['warm_p50_ms']:>8.1f} {result['load_ms']:>8.1f}"
+        )
+
+    report = {
+        "endpoint_name": endpoint_config["endpoint_name"],
+        "payload_format": payload_format,
+        "results": results,
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+    }
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report saved to {report_path}")
+    return report
+
+
+def compare_latency(
+    before_path,
+    after_path,
+    payload_formats=("npy", "npy-uint8", "jpeg"),
+    batch_size=8,
+    repeats=20,
+    report_path=None,
+):
+    # CPU latency per image of two SavedModels on the local backend, for
+    # the signature behind each payload format
+    import numpy as np
+    import tensorflow as tf
+
+    image_files = sample_image_files()
+    if not image_files:
+        print("No image files found in data directory")
+        return
+
+    results = []
+    print(f"{'format':<10} {'before ms/image':>16} {'after ms/image':>15} {'speedup':>8}")
+    for payload_format in payload_formats:
+        instances = [
+            load_instance(image_files[i % len(image_files)], payload_format)
+            for i in range(batch_size)
+        ]
+        payload = build_payload(instances, payload_format)
+        latencies = {}
+        for label, model_path in (("before", before_path), ("after", after_path)):
+            serializer, deserializer = PAYLOAD_FORMATS[payload_format]()
+            predictor = LocalPredictor(model_path, serializer, deserializer)
+            # The first calls trace and, with jit_compile, compile the graph
+            for _ in range(3):
+                predictor.predict(payload)
+            times = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                predictor.predict(payload)
+                times.append(time.perf_counter() - start)
+            latencies[label] = 1000 * float(np.median(times)) / batch_size
+        speedup = latencies["before"] / latencies["after"]
+        print(
+            f"{payload_format:<10} {latencies['before']:>16.2f} "
+            f"{latencies['after']:>15.2f} {speedup:>7.2f}x"
+        )
+        results.append(
+            {
+                "payload_format": payload_format,
+                "before_ms_per_image": latencies["before"],
+                "after_ms_per_image": latencies["after"],
+                "speedup": speedup,
+            }
+        )
+
+    report = {
+        "before": before_path,
+        "after": after_path,
+        "batch_size": batch_size,
+        "tensorflow": tf.__version__,
+        "results": results,
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+    }
+    if report_path:
+        with open(report_path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report saved to {report_path}")
+    return report
+
+
+def load_sample_images(source="data"):
+    # float32 (N, 224, 224, 3) batch of the images under source, the sample
+    # set for calibration and accuracy checks
+    import numpy as np
+
+    image_files = sample_image_files(source)
+    if not image_files:
+        return image_files, None
+    return image_files, np.stack([load_instance(path, "npy") for path in image_files])
+
+
+def export_quantized(prediction_model, output_dir):
+    # Writes model_<variant>.tflite for every TFLite variant to output_dir
+    from quantize import TFLITE_VARIANTS, convert_tflite
+
+    image_files, images = load_sample_images()
+    os.makedirs(output_dir, exist_ok=True)
+    for variant in TFLITE_VARIANTS:
+        if variant == "int8" and not image_files:
+            print("No image files found in data directory, skipping int8")
+            continue
+        print(f"Converting {variant} TFLite model")
+        tflite_model = convert_tflite(prediction_model, variant, representative_images=images)
+        with open(os.path.join(output_dir, f"model_{variant}.tflite"), "wb") as f:
+            f.write(tflite_model)
+
+
+def directory_size(path):
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, files in os.walk(path)
+        for name in files
+    )
+
+
+def compare_quantized(model_export_path, quantized_dir, repeats=5, report_path=None):
+    # Artifact size, CPU latency per image (batch size 1) and top-1
+    # agreement with the float32 SavedModel of each TFLite variant, on the
+    # images in data/. int8 was calibrated on the same images, so its
+    # agreement is optimistic for a small data/.
+    import numpy as np
+    import tensorflow as tf
+    from quantize import TFLITE_VARIANTS
+
+    image_files, images = load_sample_images()
+    if not image_files:
+        print("No image files found in data directory")
+        return
+
+    def measure(classify):
+        # Median latency per image and the predictions of the last pass
+        classify(images[:1])
+        times = []
+        for _ in range(repeats):
+            predictions = []
+            for i in range(len(images)):
+                start = time.perf_counter()
+                predictions.append(classify(images[i : i + 1])[0])
+                times.append(time.perf_counter() - start)
+        return 1000 * float(np.median(times)), np.stack(predictions)
+
+    saved_model = tf.saved_model.load(model_export_path)
+    serving_default = saved_model.signatures["serving_default"]
+    baseline_ms, baseline = measure(
+        lambda batch: next(iter(serving_default(tf.constant(batch)).values())).numpy()
+    )
+    results = [
+        {
+            "variant": "savedmodel",
+            "path": model_export_path,
+            "size_mb": directory_size(model_export_path) / 1024**2,
+            "ms_per_image": baseline_ms,
+            "speedup": 1.0,
+            "top1_agreement": 1.0,
+            "max_abs_diff": 0.0,
+        }
+    ]
+    for variant in TFLITE_VARIANTS:
+        path = os.path.join(quantized_dir, f"model_{variant}.tflite")
+        if not os.path.exists(path):
+            continue
+        interpreter = make_tflite_interpreter(path)
+        ms_per_image, predictions = measure(lambda batch: run_tflite(interpreter, batch))
+        results.append(
+            {
+                "variant": variant,
+                "path": path,
+                "size_mb": os.path.getsize(path) / 1024**2,
+                "ms_per_image": ms_per_image,
+                "speedup": baseline_ms / ms_per_image,
+                "top1_agreement": float(
+                    np.mean(predictions.argmax(axis=1) == baseline.argmax(axis=1))
+                ),
+                "max_abs_diff": float(np.max(np.abs(predictions - baseline))),
+            }
+        )
+
+    print(
+        f"{'variant':<11} {'size MB':>8} {'ms/image':>9} {'speedup':>8} "
+        f"{'top-1 agree':>12} {'max diff':>9}"
+    )
+    for result in results:
+        print(
+            f"{result['variant']:<11} {result['size_mb']:>8.1f} "
+            f"{result['ms_per_image']:>9.2f} {result['speedup']:>7.2f}x "
+            f"{result['top1_agreement']:>12.1%} {result['max_abs_diff']:>9.4f}"
+        )
+
+    report = {
+        "num_images": len(image_files),
+        "tensorflow": tf.__version__,
+        "results": results,
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+    }
+    if report_path:
+        with open(report_path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report saved to {report_path}")
+    return report
+
+
+def default_thread_counts():
+    # 1, 2, 4 and every core, as far as the machine has them
+    cpu_count = os.cpu_count() or 1
+    return sorted({1, 2, 4, cpu_count} & set(range(1, cpu_count + 1)))
+
+
+def compare_backends(backends, images, batch_sizes=(1, 8), repeats=5):
+    # Load time, CPU latency per image and top-1 agreement with the first
+    # backend, for (name, num_threads, make_predictor_fn) tuples where
+    # make_predictor_fn(serializer, deserializer) builds a local predictor.
+    # images are sent as npy requests.
+    import numpy as np
+
+    results = []
+    baseline = None
+    print(
+        f"{'backend':<16} {'threads':>7} {'load s':>7} "
+        + " ".join(f"{f'ms/img b={b}':>11}" for b in batch_sizes)
+        + f" {'top-1 agree':>12}"
+    )
+    for name, num_threads, make_predictor_fn in backends:
+        start = time.perf_counter()
+        predictor = make_predictor_fn(*PAYLOAD_FORMATS["npy"]())
+        load_s = time.perf_counter() - start
+
+        ms_per_image = {}
+        for batch_size in batch_sizes:
+            batches = [
+                build_payload(
+                    [images[(i + j) % len(images)] for j in range(batch_size)], "npy"
+                )
+                for i in range(0, len(images), batch_size)
+            ]
+            predictor.predict(batches[0])
+            times = []
+            for _ in range(repeats):
+                for payload in batches:
+                    start = time.perf_counter()
+                    predictor.predict(payload)
+                    times.append(time.perf_counter() - start)
+            ms_per_image[str(batch_size)] = 1000 * float(np.median(times)) / batch_size
+
+        predictions = np.asarray(predictor.predict(build_payload(list(images), "npy")))
+        if baseline is None:
+            baseline = predictions
+        agreement = float(np.mean(predictions.argmax(axis=1) == baseline.argmax(axis=1)))
+
+        result = {
+            "backend": name,
+            "num_threads": num_threads,
+            "load_s": load_s,
+            "ms_per_image": ms_per_image,
+            "top1_agreement": agreement,
+        }
+        results.append(result)
+        print(
+            f"{name:<16} {num_threads or '-':>7} {load_s:>7.2f} "
+            + " ".join(f"{ms_per_image[str(b)]:>11.2f}" for b in batch_sizes)
+            + f" {agreement:>12.1%}"
+        )
+    return results
+
+
+def bench_tflite(
+    thread_counts=None, batch_sizes=(1, 8), repeats=5, report_path="bench_tflite_report.json"
+):
+    # The tflite backend (with and without XNNPACK, per thread count)
+    # against the SavedModel backend on the images in data/
+    image_files, images = load_sample_images()
+    if not image_files:
+        print("No image files found in data directory")
+        return
+    for path in (LOCAL_MODEL_PATH, LOCAL_TFLITE_PATH):
+        if not os.path.exists(path):
+            print(f"{path} not found, run python cli.py --prepare --tflite first")
+            return
+    thread_counts = thread_counts or default_thread_counts()
+
+    def savedmodel(serializer, deserializer):
+        return LocalPredictor(LOCAL_MODEL_PATH, serializer, deserializer)
+
+    def tflite(num_threads, xnnpack):
+        return lambda serializer, deserializer: TFLitePredictor(
+            LOCAL_TFLITE_PATH, serializer, deserializer, num_threads, xnnpack
+        )
+
+    backends = [("savedmodel", None, savedmodel)]
+    backends.extend(
+        ("tflite-xnnpack", num_threads, tflite(num_threads, True))
+        for num_threads in thread_counts
+    )
+    backends.append(("tflite-builtin", thread_counts[-1], tflite(thread_counts[-1], False)))
+    results = compare_backends(backends, images, batch_sizes, repeats)
+
+    report = {
+        "num_images": len(image_files),
+        "tflite_model": LOCAL_TFLITE_PATH,
+        "tflite_size_mb": os.path.getsize(LOCAL_TFLITE_PATH) / 1024**2,
+        "results": results,
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+    }
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report saved to {report_path}")
+    return report
+
+
+def bench_onnx(
+    thread_counts=None, batch_sizes=(1, 8, 32), repeats=5, report_path="bench_onnx_report.json"
+):
+    # The onnx backend per intra-op thread count against the SavedModel
+    # backend on the images in data/. Larger batches show the throughput
+    # of offline scoring.
+    image_files, images = load_sample_images()
+    if not image_files:
+        print("No image files found in data directory")
+        return
+    for path in (LOCAL_MODEL_PATH, LOCAL_ONNX_PATH):
+        if not os.path.exists(path):
+            print(f"{path} not found, run python cli.py --prepare --onnx first")
+            return
+    thread_counts = thread_counts or default_thread_counts()
+
+    def savedmodel(serializer, deserializer):
+        return LocalPredictor(LOCAL_MODEL_PATH, serializer, deserializer)
+
+    def onnx(num_threads):
+        return lambda serializer, deserializer: ONNXPredictor(
+            LOCAL_ONNX_PATH, serializer, deserializer, intra_op_threads=num_threads
+        )
+
+    backends = [("savedmodel", None, savedmodel)]
+    backends.extend(("onnx", num_threads, onnx(num_threads)) for num_threads in thread_counts)
+    results = compare_backends(backends, images, batch_sizes, repeats)
+
+    report = {
+        "num_images": len(image_files),
+        "onnx_model": LOCAL_ONNX_PATH,
+        "onnx_size_mb": os.path.getsize(LOCAL_ONNX_PATH) / 1024**2,
+        "results": results,
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+    }
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report saved to {report_path}")
+    return report
+
+
+def bench_package():
+    # Time packaging of the SavedModel from --prepare with each compression
+    # setting
+    model_export_path = LOCAL_MODEL_PATH
+    if not os.path.exists(model_export_path):
+        print(f"{model_export_path} not found, run python cli.py --prepare first")
+        return
+
+    settings = [
+        ("gzip", 9),
+        ("gzip", 6),
+        ("gzip", 1),
+        ("pigz", 9),
+        ("pigz", 6),
+        ("pigz", 1),
+        ("none", 0),
+    ]
+    bench_tar_path = f"./artifacts/{BEST_MODEL}/bench.tar.gz"
+    results = []
+    try:
+        for compression, compression_level in settings:
+            elapsed, size = package_model(
+                model_export_path, bench_tar_path, compression, compression_level
+            )
+            results.append((compression, compression_level, elapsed, size))
+    finally:
+        if os.path.exists(bench_tar_path):
+            os.remove(bench_tar_path)
+
+    print(f"{'compression':<12} {'level':>5} {'seconds':>8} {'MB':>8}")
+    for compression, compression_level, elapsed, size in results:
+        print(f"{compression:<12} {compression_level:>5} {elapsed:>8.2f} {size / 1e6:>8.1f}")
+
+
+def bench_payload():
+    # Compare bytes on the wire and client CPU time per image for each format
+    image_files = sample_image_files()
+    if not image_files:
+        print("No image files found in data directory")
+        return
+
+    repeats = 5
+
+    print(f"{'format':<10} {'bytes/image':>12} {'cpu ms/image':>13}")
+    for payload_format, make_serializers in PAYLOAD_FORMATS.items():
+        serializer, _ = make_serializers()
+        images = [load_instance(img_path, payload_format) for img_path in image_files]
+        total_bytes = 0
+        start = time.process_time()
+        for _ in range(repeats):
+            for arr in images:
+                body = serializer.serialize(build_payload([arr], payload_format))
+                total_bytes += len(body)
+        elapsed = time.process_time() - start
+
+        count = repeats * len(images)
+        print(
+            f"{payload_format:<10} {total_bytes / count:>12,.0f} "
+            f"{1000 * elapsed / count:>13.2f}"
+        )
+
+
+def bench_preprocess():
+    # Single-threaded images/second for each preprocessing variant, i.e.
+    # throughput per core
+    import numpy as np
+    from preprocess import load_image
+
+    image_files = sample_image_files()
+    if not image_files:
+        print("No image files found in data directory")
+        return
+
+    float_buffer = np.empty((224, 224, 3), dtype=np.float32)
+    uint8_buffer = np.empty((224, 224, 3), dtype=np.uint8)
+    variants = {
+        "baseline": lambda img_path: load_image(img_path, draft=False),
+        "draft": lambda img_path: load_image(img_path),
+        "draft+buffer": lambda img_path: load_image(img_path, out=float_buffer),
+        "draft+uint8": lambda img_path: load_image(img_path, out=uint8_buffer),
+    }
+    repeats = 10
+
+    print(f"{'variant':<14} {'images/s/core':>14} {'bytes/image':>12}")
+    for name, fn in variants.items():
+        start = time.process_time()
+        for _ in range(repeats):
+            for img_path in image_files:
+                arr = fn(img_path)
+        elapsed = time.process_time() - start
+        count = repeats * len(image_files)
+        print(f"{name:<14} {count / elapsed:>14.1f} {arr.nbytes:>12,}")
+
+
+# Commands timed by --bench-imports. Everything runs against an unreachable
+# AWS endpoint, so the commands fail fast instead of touching real resources
+# and only the startup cost is measured.
+IMPORT_BENCH_COMMANDS = [
+    ["--help"],
+    ["--predict"],
+    ["--predict", "--payload-format", "npy"],
+    ["--predict", "--backend", "local"],
+    ["--predict", "--backend", "tflite"],
+    ["--predict", "--backend", "onnx"],
+    ["--score", "data", "--backend", "local", "--output", "scores.jsonl"],
+    ["--deploy"],
+    ["--delete"],
+    ["--prepare"],
+]
+
+# Runs cli.py as __main__ and reports the peak RSS of the process on exit
+IMPORT_BENCH_CODE = """
+import atexit, os, resource, runpy, sys
+atexit.register(
+    lambda: print("max rss kb:", resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, file=sys.stderr)
+)
+sys.argv = sys.argv[1:]
+sys.path[0] = os.path.dirname(sys.argv[0])
+runpy.run_path(sys.argv[0], run_name="__main__")
+"""
+
+IMPORT_TIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+def parse_import_times(stderr):
+    # Returns {top-level package: cumulative us} and the total self time in
+    # us from the output of python -X importtime
+    packages = {}
+    total_us = 0
+    for line in stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        total_us += int(self_us)
+        # Only imports at the first nesting level, the ones cli.py triggers
+        if len(indent) == 0:
+            package = name.split(".")[0]
+            packages[package] = packages.get(package, 0) + int(cumulative_us)
+    return packages, total_us
+
+
+def bench_imports(commands=IMPORT_BENCH_COMMANDS, report_path="bench_imports_report.json"):
+    # Startup cost of each subcommand: wall time, time spent importing and
+    # peak RSS, measured in a fresh interpreter with python -X importtime
+    cli_path = os.path.abspath(__file__)
+    env = dict(
+        os.environ,
+        AWS_ACCESS_KEY_ID="bench",
+        AWS_SECRET_ACCESS_KEY="bench",
+        AWS_DEFAULT_REGION=AWS_REGION,
+        AWS_ENDPOINT_URL="http://127.0.0.1:9",
+        AWS_MAX_ATTEMPTS="1",
+    )
+    results = []
+    print(
+        f"{'command':<48} {'wall s':>7} {'import s':>8} {'rss MB':>7} "
+        f"{'tf':>3} {'sm':>3}  slowest imports"
+    )
+    with tempfile.TemporaryDirectory() as workdir:
+        # Commands that read data/ see the real images, nothing else from
+        # the working directory (endpoint config, artifacts) is picked up
+        if os.path.isdir("data"):
+            os.symlink(os.path.abspath("data"), os.path.join(workdir, "data"))
+        for command in commands:
+            start = time.perf_counter()
+            completed = subprocess.run(
+                [sys.executable, "-X", "importtime", "-c", IMPORT_BENCH_CODE, cli_path]
+                + command,
+                cwd=workdir,
+                env=env,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                text=True,
+            )
+            wall_s = time.perf_counter() - start
+            packages, import_us = parse_import_times(completed.stderr)
+            rss_match = re.search(r"max rss kb: (\d+)", completed.stderr)
+            slowest = sorted(packages.items(), key=lambda item: -item[1])[:3]
+            result = {
+                "command": " ".join(["cli.py"] + command),
+                "exit_code": completed.returncode,
+                "wall_s": wall_s,
+                "import_s": import_us / 1e6,
+                "max_rss_mb": int(rss_match.group(1)) / 1024 if rss_match else None,
+                "tensorflow": "tensorflow" in packages,
+                "sagemaker": "sagemaker" in packages,
+                "slowest_imports_ms": {name: us / 1000 for name, us in slowest},
+            }
+            results.append(result)
+            slowest_text = ", ".join(f"{name} {us / 1000:.0f}ms" for name, us in slowest)
+            rss_text = f"{result['max_rss_mb']:>7.0f}" if rss_match else f"{'?':>7}"
+            print(
+                f"{result['command']:<48} {wall_s:>7.2f} {result['import_s']:>8.2f} "
+                f"{rss_text} {'yes' if result['tensorflow'] else 'no':>3} "
+                f"{'yes' if result['sagemaker'] else 'no':>3}  {slowest_text}"
+            )
+
+    report = {
+        "python": sys.version.split()[0],
+        "results": results,
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+    }
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report saved to {report_path}")
+    return report
+
+
+class LoopbackEndpoint:
+    # Local HTTP server that answers every InvokeEndpoint call with a fixed
+    # body, so the client side of an invocation can be timed without the
+    # network or a model
+    def __init__(self, response_body, accept):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class Handler(BaseHTTPRequestHandler):
+            # HTTP/1.1 so the client can keep its pooled connection open,
+            # and no Nagle delay between the header and body writes
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                self.send_response(200)
+                self.send_header("Content-Type", accept)
+                self.send_header("Content-Length", str(len(response_body)))
+                self.send_header("x-Amzn-Invoked-Production-Variant", "AllTraffic")
+                self.end_headers()
+                self.wfile.write(response_body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def bench_invoke(
+    payload_format="json",
+    batch_size=1,
+    num_requests=200,
+    live=False,
+    report_path="bench_invoke_report.json",
+):
+    # Per-call overhead of sagemaker.Predictor against EndpointPredictor.
+    # By default both call a loopback server with a canned response, so the
+    # difference is pure client overhead. With live they call the endpoint
+    # in endpoint_config.json.
+    import numpy as np
+
+    # EndpointPredictor also skips importing sagemaker
+    start = time.perf_counter()
+    import sagemaker
+
+    import_ms = (time.perf_counter() - start) * 1000
+
+    image_files = sample_image_files()
+    if not image_files:
+        print("No image files found in data directory")
+        return
+    instances = [
+        load_instance(image_files[i % len(image_files)], payload_format)
+        for i in range(batch_size)
+    ]
+    payload = build_payload(instances, payload_format)
+    accept = PAYLOAD_CONTENT_TYPES[payload_format][1]
+
+    loopback = None
+    client_kwargs = {}
+    if live:
+        endpoint_name = load_endpoint_config()["endpoint_name"]
+    else:
+        predictions = np.full((batch_size, data_details["num_classes"]), 0.25, np.float32)
+        if accept == "application/x-npy":
+            response = io.BytesIO()
+            np.save(response, predictions)
+            response_body = response.getvalue()
+        else:
+            response_body = json.dumps({"predictions": predictions.tolist()}).encode("utf-8")
+        loopback = LoopbackEndpoint(response_body, accept)
+        endpoint_name = "loopback"
+        client_kwargs = {
+            "endpoint_url": loopback.url,
+            "aws_access_key_id": "loopback",
+            "aws_secret_access_key": "loopback",
+        }
+
+    def make_sagemaker_predictor():
+        return make_predictor(
+            endpoint_name,
+            payload_format,
+            runtime_client=make_runtime_client(**client_kwargs),
+        )
+
+    def make_endpoint_predictor():
+        return EndpointPredictor(
+            endpoint_name,
+            payload_format,
+            runtime_client=make_runtime_client(**client_kwargs),
+        )
+
+    clients = [
+        ("sagemaker.Predictor", make_sagemaker_predictor),
+        ("EndpointPredictor", make_endpoint_predictor),
+    ]
+    results = []
+    outputs = []
+    print(
+        f"{'client':<20} {'setup ms':>9} {'p50 ms':>8} {'p99 ms':>8} {'cpu ms/call':>12}"
+    )
+    try:
+        for name, make_client in clients:
+            start = time.perf_counter()
+            predictor = make_client()
+            setup_ms = (time.perf_counter() - start) * 1000
+
+            # Open the pooled connection before timing
+            for _ in range(5):
+                predictor.predict(payload)
+            latencies = []
+            cpu_start = time.process_time()
+            for _ in range(num_requests):
+                start = time.perf_counter()
+                result = predictor.predict(payload)
+                latencies.append((time.perf_counter() - start) * 1000)
+            cpu_ms = (time.process_time() - cpu_start) * 1000 / num_requests
+            outputs.append(parse_predictions(result))
+
+            result = {
+                "client": name,
+                "setup_ms": setup_ms,
+                "p50_ms": float(np.percentile(latencies, 50)),
+                "p99_ms": float(np.percentile(latencies, 99)),
+                "cpu_ms_per_call": cpu_ms,
+            }
+            results.append(result)
+            print(
+                f"{name:<20} {setup_ms:>9.1f} {result['p50_ms']:>8.2f} "
+                f"{result['p99_ms']:>8.2f} {cpu_ms:>12.3f}"
+            )
+    finally:
+        if loopback is not None:
+            loopback.close()
+
+    # Both clients must hand back the same predictions
+    same_result = bool(np.allclose(np.asarray(outputs[0]), np.asarray(outputs[1])))
+    saved = {
+        "setup_ms": results[0]["setup_ms"] - results[1]["setup_ms"],
+        "p50_ms": results[0]["p50_ms"] - results[1]["p50_ms"],
+        "cpu_ms_per_call": results[0]["cpu_ms_per_call"] - results[1]["cpu_ms_per_call"],
+    }
+    print(
+        f"EndpointPredictor saves {saved['p50_ms']:.2f} ms p50 and "
+        f"{saved['cpu_ms_per_call']:.3f} ms CPU per call, "
+        f"{saved['setup_ms']:.0f} ms setup and {import_ms:.0f} ms importing sagemaker "
+        f"(same result: {same_result})"
+    )
+
+    report = {
+        "endpoint": "live" if live else "loopback",
+        "endpoint_name": endpoint_name,
+        "payload_format": payload_format,
+        "batch_size": batch_size,
+        "num_requests": num_requests,
+        "sagemaker": sagemaker.__version__,
+        "sagemaker_import_ms": import_ms,
+        "same_result": same_result,
+        "saved": saved,
+        "results": results,
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+    }
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report saved to {report_path}")
+    return report
+
+
+def main(args=None):
+
+    if args.prepare:
+        print("Prepare model and save model to GCS Bucket")
+        prepare(
+            upload_part_size_mb=args.upload_part_size_mb,
+            upload_concurrency=args.upload_concurrency,
+            checksum_algorithm=args.checksum_algorithm,
+            force=args.force,
+            stream_extract=args.stream_extract,
+            model_sha256=args.model_sha256,
+            compression=args.compression,
+            compression_level=args.compression_level,
+            multi_model_name=args.multi_model,
+            optimize=args.optimize,
+            jit_compile=args.jit_compile,
+            quantize=args.quantize,
+            tflite=args.tflite,
+            tflite_variant=args.tflite_variant,
+            onnx=args.onnx,
+            onnx_opset=args.onnx_opset,
+        )
+
+    elif args.deploy:
+        print("Deploy model")
+        deploy(
+            min_capacity=args.min_instances,
+            max_capacity=args.max_instances,
+            target_invocations=args.target_invocations,
+            scale_in_cooldown=args.scale_in_cooldown,
+            scale_out_cooldown=args.scale_out_cooldown,
+            instance_type=args.instance_type,
+            mode=args.mode,
+            serverless_memory_mb=args.serverless_memory_mb,
+            serverless_max_concurrency=args.serverless_max_concurrency,
+            async_max_concurrency=args.async_max_concurrency,
+            sns_success_topic=args.sns_success_topic,
+            sns_error_topic=args.sns_error_topic,
+            multi_model_name=args.multi_model,
+        )
+
+    elif args.update:
+        print("Update endpoint with a blue/green deployment")
+        update(
+            model_data=args.model_data,
+            instance_type=args.update_instance_type,
+            instance_count=args.update_instance_count,
+            traffic_routing=args.traffic_routing,
+            canary_percent=args.canary_percent,
+            linear_step_percent=args.linear_step_percent,
+            wait_interval=args.wait_interval,
+            termination_wait=args.termination_wait,
+            max_p99_latency_ms=args.max_p99_latency_ms,
+            max_5xx_errors=args.max_5xx_errors,
+        )
+
+    elif args.autoscale:
+        print("Update endpoint autoscaling")
+        autoscale(
+            min_capacity=args.min_instances,
+            max_capacity=args.max_instances,
+            target_invocations=args.target_invocations,
+            scale_in_cooldown=args.scale_in_cooldown,
+            scale_out_cooldown=args.scale_out_cooldown,
+        )
+
+    elif args.predict:
+        print("Predict using endpoint")
+        predict(
+            payload_format=args.payload_format,
+            num_images=args.num_images,
+            batch_size=args.batch_size,
+            max_payload_bytes=args.max_payload_bytes,
+            concurrency=args.concurrency,
+            timeout=args.timeout,
+            backend=args.backend,
+            target_model=args.target_model,
+            tflite_threads=args.tflite_threads,
+            onnx_threads=args.onnx_threads,
+            async_timeout=args.async_timeout,
+        )
+
+    elif args.score:
+        print("Score images using endpoint")
+        score(
+            args.score,
+            args.output,
+            payload_format=args.payload_format,
+            batch_size=args.batch_size,
+            max_payload_bytes=args.max_payload_bytes,
+            concurrency=args.concurrency,
+            decode_workers=args.decode_workers,
+            timeout=args.timeout,
+            resume=not args.no_resume,
+            backend=args.backend,
+            target_model=args.target_model,
+            tflite_threads=args.tflite_threads,
+            onnx_threads=args.onnx_threads,
+            async_timeout=args.async_timeout,
+        )
+
+    elif args.transform:
+        print("Score images with a Batch Transform job")
+        transform(
+            args.transform,
+            args.output,
+            output_prefix=args.transform_output,
+            instance_type=args.instance_type,
+            instance_count=args.min_instances,
+            max_payload_mb=args.max_payload_mb,
+            max_concurrent_transforms=args.max_concurrent_transforms,
+            backend=args.backend,
+        )
+
+    elif args.rightsize:
+        print("Right-size the endpoint instance type")
+        rightsize(
+            args.rightsize,
+            target_p99_ms=args.target_p99_ms,
+            payload_format=args.payload_format,
+            batch_size=args.batch_size,
+            duration=args.duration,
+            local=args.rightsize_local,
+            prices_path=args.prices,
+            report_path=args.report or "rightsize_report.json",
+        )
+
+    elif args.bench:
+        print("Benchmark endpoint latency and throughput")
+        bench(
+            payload_format=args.payload_format,
+            batch_size=args.batch_size,
+            rps=args.rps,
+            concurrency=args.concurrency,
+            duration=args.duration,
+            warmup=args.warmup,
+            timeout=args.timeout,
+            backend=args.backend,
+            report_path=args.report or "bench_report.json",
+            target_model=args.target_model,
+            tflite_threads=args.tflite_threads,
+            onnx_threads=args.onnx_threads,
+            async_timeout=args.async_timeout,
+        )
+
+    elif args.model_latency is not None:
+        print("Measure multi-model endpoint load latency")
+        model_latency(
+            args.model_latency,
+            payload_format=args.payload_format,
+            timeout=args.timeout,
+            report_path=args.report or "model_latency_report.json",
+        )
+
+    elif args.bench_tflite:
+        print("Compare the tflite and SavedModel local backends")
+        bench_tflite(
+            thread_counts=[args.tflite_threads] if args.tflite_threads else None,
+            report_path=args.report or "bench_tflite_report.json",
+        )
+
+    elif args.bench_onnx:
+        print("Compare the onnx and SavedModel local backends")
+        bench_onnx(
+            thread_counts=[args.onnx_threads] if args.onnx_threads else None,
+            report_path=args.report or "bench_onnx_report.json",
+        )
+
+    elif args.bench_quantize:
+        print("Compare the quantized TFLite models with the SavedModel")
+        compare_quantized(
+            LOCAL_MODEL_PATH,
+            QUANTIZED_MODEL_DIR,
+            report_path=args.report or "quantize_report.json",
+        )
+
+    elif args.bench_optimize:
+        print("Compare latency of the plain and optimized exports")
+        compare_latency(
+            RAW_MODEL_PATH,
+            LOCAL_MODEL_PATH,
+            batch_size=args.batch_size,
+            report_path=args.report or "optimize_report.json",
+        )
+
+    elif args.bench_package:
+        print("Benchmark model.tar.gz packaging")
+        bench_package()
+
+    elif args.bench_payload:
+        print("Benchmark request payload formats")
+        bench_payload()
+
+    elif args.bench_preprocess:
+        print("Benchmark image preprocessing")
+        bench_preprocess()
+
+    elif args.bench_invoke:
+        print("Benchmark per-call overhead of the endpoint clients")
+        bench_invoke(
+            payload_format=args.payload_format,
+            batch_size=args.batch_size,
+            num_requests=args.num_requests,
+            live=args.live,
+            report_path=args.report or "bench_invoke_report.json",
+        )
+
+    elif args.bench_imports:
+        print("Benchmark CLI startup time per command")
+        bench_imports(report_path=args.report or "bench_imports_report.json")
+
+    elif args.delete:
+        print("Delete endpoint, model, and S3 artifacts")
+        delete()
+
+
+if __name__ == "__main__":
+    # Generate the inputs arguments parser
+    # if you type into the terminal 'python cli.py --help', it will provide the description
+    parser = argparse.ArgumentParser(description="Data Collector CLI")
+
+    parser.add_argument(
+        "--prepare",
+        action="store_true",
+        help="Prepare model and save model to GCS Bucket",
+    )
+    parser.add_argument(
+        "--deploy",
+        action="store_true",
+        help="Deploy saved model to Vertex AI",
+    )
     parser.add_argument(
         "--predict",
         action="store_true",
@@ -361,6 +3424,463 @@ if __name__ == "__main__":
         action="store_true",
         help="Delete endpoint, endpoint config, model, and S3 artifacts",
     )
+    parser.add_argument(
+        "--score",
+        metavar="SOURCE",
+        help="Score every image under a local directory or s3://bucket/prefix",
+    )
+    parser.add_argument(
+        "--output",
+        default="scores.jsonl",
+        help="Results file for --score or --transform, .jsonl or a Parquet directory "
+        "(default: scores.jsonl)",
+    )
+    parser.add_argument(
+        "--transform",
+        metavar="SOURCE",
+        help="Score every image under s3://bucket/prefix with a Batch Transform job",
+    )
+    parser.add_argument(
+        "--transform-output",
+        help="Where --transform writes the raw job outputs "
+        "(default: s3://<bucket>/<BEST_MODEL>/transform-output/<timestamp>)",
+    )
+    parser.add_argument(
+        "--max-payload-mb",
+        type=int,
+        default=6,
+        help="Largest request of a --transform job in MB, must fit the largest image (default: 6)",
+    )
+    parser.add_argument(
+        "--max-concurrent-transforms",
+        type=int,
+        default=4,
+        help="Parallel requests to each --transform instance (default: 4)",
+    )
+    parser.add_argument(
+        "--decode-workers",
+        type=int,
+        default=4,
+        help="Number of threads reading and decoding images for --score (default: 4)",
+    )
+    parser.add_argument(
+        "--no-resume",
+        action="store_true",
+        help="Ignore the checkpoint of a previous --score run and start over",
+    )
+    parser.add_argument(
+        "--optimize",
+        action="store_true",
+        help="Freeze and Grappler-optimize the serving graphs in --prepare, "
+        "and report CPU latency before and after",
+    )
+    parser.add_argument(
+        "--jit-compile",
+        action="store_true",
+        help="With --optimize, compile the serving functions with XLA",
+    )
+    parser.add_argument(
+        "--quantize",
+        action="store_true",
+        help="Also write dynamic-range, float16 and int8 TFLite models in --prepare "
+        "and report their size, latency and agreement with the SavedModel",
+    )
+    parser.add_argument(
+        "--tflite",
+        action="store_true",
+        help=f"Also write a TFLite model for --backend tflite in --prepare ({LOCAL_TFLITE_PATH})",
+    )
+    parser.add_argument(
+        "--tflite-variant",
+        choices=["float32", "dynamic", "float16", "int8"],
+        default="float32",
+        help="Quantization of the --tflite model (default: float32)",
+    )
+    parser.add_argument(
+        "--tflite-threads",
+        type=int,
+        default=None,
+        help="CPU threads of the tflite backend (default: the TFLite default)",
+    )
+    parser.add_argument(
+        "--bench-tflite",
+        action="store_true",
+        help="Compare load time, latency and agreement of the tflite and local backends",
+    )
+    parser.add_argument(
+        "--onnx",
+        action="store_true",
+        help=f"Also write an ONNX model for --backend onnx in --prepare ({LOCAL_ONNX_PATH})",
+    )
+    parser.add_argument(
+        "--onnx-opset",
+        type=int,
+        default=17,
+        help="ONNX opset of the --onnx model (default: 17)",
+    )
+    parser.add_argument(
+        "--onnx-threads",
+        type=int,
+        default=None,
+        help="Intra-op threads of the onnx backend (default: one per core)",
+    )
+    parser.add_argument(
+        "--bench-onnx",
+        action="store_true",
+        help="Compare load time, latency and agreement of the onnx and local backends",
+    )
+    parser.add_argument(
+        "--bench-quantize",
+        action="store_true",
+        help="Compare the TFLite models of --prepare --quantize with the SavedModel",
+    )
+    parser.add_argument(
+        "--bench-optimize",
+        action="store_true",
+        help="Compare local latency of the plain and optimized exports of --prepare --optimize",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Rebuild and re-upload every --prepare stage even if it is up to date",
+    )
+    parser.add_argument(
+        "--instance-type",
+        choices=sorted(INSTANCE_TYPES),
+        default=DEFAULT_INSTANCE_TYPE,
+        help=f"Endpoint instance type for --deploy (default: {DEFAULT_INSTANCE_TYPE})",
+    )
+    parser.add_argument(
+        "--mode",
+        choices=DEPLOY_MODES,
+        default="realtime",
+        help="Endpoint type for --deploy: instance-backed real-time, per-request "
+        "serverless, or queued async with results in S3 (default: realtime)",
+    )
+    parser.add_argument(
+        "--serverless-memory-mb",
+        type=int,
+        choices=(1024, 2048, 3072, 4096, 5120, 6144),
+        default=2048,
+        help="Memory of a --mode serverless endpoint, CPU scales with it (default: 2048)",
+    )
+    parser.add_argument(
+        "--serverless-max-concurrency",
+        type=int,
+        default=5,
+        help="Concurrent invocations of a --mode serverless endpoint (default: 5)",
+    )
+    parser.add_argument(
+        "--async-max-concurrency",
+        type=int,
+        default=4,
+        help="Concurrent requests per instance of a --mode async endpoint (default: 4)",
+    )
+    parser.add_argument(
+        "--sns-success-topic",
+        help="SNS topic ARN notified when a --mode async request completes",
+    )
+    parser.add_argument(
+        "--sns-error-topic",
+        help="SNS topic ARN notified when a --mode async request fails",
+    )
+    parser.add_argument(
+        "--update",
+        action="store_true",
+        help="Move the deployed endpoint to the latest prepared model with a "
+        "blue/green deployment and automatic rollback",
+    )
+    parser.add_argument(
+        "--model-data",
+        help="S3 URI of the model.tar.gz for --update (default: a pinned copy of "
+        "the artifact uploaded by --prepare)",
+    )
+    parser.add_argument(
+        "--update-instance-type",
+        choices=sorted(INSTANCE_TYPES),
+        help="Instance type of the new fleet for --update (default: unchanged)",
+    )
+    parser.add_argument(
+        "--update-instance-count",
+        type=int,
+        help="Instance count of the new fleet for --update (default: unchanged)",
+    )
+    parser.add_argument(
+        "--traffic-routing",
+        choices=sorted(TRAFFIC_ROUTING_TYPES),
+        default="canary",
+        help="How --update shifts traffic to the new fleet (default: canary)",
+    )
+    parser.add_argument(
+        "--canary-percent",
+        type=int,
+        default=10,
+        help="Share of capacity that gets traffic first with --traffic-routing canary (default: 10)",
+    )
+    parser.add_argument(
+        "--linear-step-percent",
+        type=int,
+        default=20,
+        help="Share of capacity shifted per step with --traffic-routing linear (default: 20)",
+    )
+    parser.add_argument(
+        "--wait-interval",
+        type=int,
+        default=300,
+        help="Seconds to watch the alarms after each traffic shift (default: 300)",
+    )
+    parser.add_argument(
+        "--termination-wait",
+        type=int,
+        default=300,
+        help="Seconds to keep the old fleet after the last shift, for rollback (default: 300)",
+    )
+    parser.add_argument(
+        "--max-p99-latency-ms",
+        type=float,
+        default=1000.0,
+        help="Roll --update back when p99 model latency reaches this (default: 1000)",
+    )
+    parser.add_argument(
+        "--max-5xx-errors",
+        type=int,
+        default=1,
+        help="Roll --update back at this many 5xx errors in a minute (default: 1)",
+    )
+    parser.add_argument(
+        "--multi-model",
+        nargs="?",
+        const=BEST_MODEL,
+        metavar="NAME",
+        help="With --prepare, add the model to the multi-model prefix as NAME. "
+        f"With --deploy, deploy a multi-model endpoint for {MULTI_MODEL_PREFIX} "
+        f"with NAME as the default model (default NAME: {BEST_MODEL})",
+    )
+    parser.add_argument(
+        "--target-model",
+        metavar="NAME",
+        help="Model of a multi-model endpoint to send --predict, --score or --bench requests to",
+    )
+    parser.add_argument(
+        "--model-latency",
+        nargs="*",
+        metavar="NAME",
+        help="Time the first (model loading) and warm requests of each model of a "
+        "multi-model endpoint (default: every model under the prefix)",
+    )
+    parser.add_argument(
+        "--rightsize",
+        nargs="+",
+        metavar="INSTANCE_TYPE",
+        choices=sorted(INSTANCE_TYPES),
+        help="Load test each instance type and report the cost per 1M inferences",
+    )
+    parser.add_argument(
+        "--target-p99-ms",
+        type=float,
+        default=200.0,
+        help="p99 latency an instance type must meet for --rightsize (default: 200)",
+    )
+    parser.add_argument(
+        "--rightsize-local",
+        action="store_true",
+        help="Run --rightsize against a local tensorflow/serving container with "
+        "each instance type's CPU and memory limits",
+    )
+    parser.add_argument(
+        "--prices",
+        help="JSON file of instance type to USD per hour, overriding the built-in prices",
+    )
+    parser.add_argument(
+        "--autoscale",
+        action="store_true",
+        help="Update the autoscaling policy of the deployed endpoint",
+    )
+    parser.add_argument(
+        "--min-instances",
+        type=int,
+        default=1,
+        help="Initial and minimum endpoint instance count (default: 1)",
+    )
+    parser.add_argument(
+        "--max-instances",
+        type=int,
+        default=1,
+        help="Maximum instance count, autoscaling is enabled when above --min-instances (default: 1)",
+    )
+    parser.add_argument(
+        "--target-invocations",
+        type=float,
+        default=100.0,
+        help="Target invocations per instance per minute for autoscaling (default: 100)",
+    )
+    parser.add_argument(
+        "--scale-in-cooldown",
+        type=int,
+        default=300,
+        help="Seconds between scale-in activities (default: 300)",
+    )
+    parser.add_argument(
+        "--scale-out-cooldown",
+        type=int,
+        default=60,
+        help="Seconds between scale-out activities (default: 60)",
+    )
+    parser.add_argument(
+        "--stream-extract",
+        action="store_true",
+        help="Extract the model archive while downloading instead of saving it first",
+    )
+    parser.add_argument(
+        "--model-sha256",
+        default=MODEL_RELEASE_SHA256,
+        help="Expected sha256 of the model release archive "
+        "(default: MODEL_RELEASE_SHA256 environment variable)",
+    )
+    parser.add_argument(
+        "--compression",
+        choices=["gzip", "pigz", "none"],
+        default="gzip",
+        help="model.tar.gz compression: single-threaded gzip, multi-threaded pigz, "
+        "or none (default: gzip)",
+    )
+    parser.add_argument(
+        "--compression-level",
+        type=int,
+        default=9,
+        help="Deflate level 1-9 for --compression gzip/pigz (default: 9)",
+    )
+    parser.add_argument(
+        "--upload-part-size-mb",
+        type=int,
+        default=64,
+        help="Multipart part size for the model.tar.gz upload (default: 64)",
+    )
+    parser.add_argument(
+        "--upload-concurrency",
+        type=int,
+        default=10,
+        help="Number of parts uploaded in parallel (default: 10)",
+    )
+    parser.add_argument(
+        "--checksum-algorithm",
+        choices=["SHA256", "SHA1", "CRC32", "CRC32C"],
+        default="SHA256",
+        help="Per-part checksum verified on upload (default: SHA256, CRC32C needs awscrt)",
+    )
+    parser.add_argument(
+        "--bench",
+        action="store_true",
+        help="Load test the endpoint and write a JSON latency/throughput report",
+    )
+    parser.add_argument(
+        "--rps",
+        type=float,
+        help="Fixed request rate for --bench, otherwise run at fixed --concurrency",
+    )
+    parser.add_argument(
+        "--duration",
+        type=int,
+        default=60,
+        help="Seconds to run --bench, or each --rightsize step, for (default: 60)",
+    )
+    parser.add_argument(
+        "--warmup",
+        type=int,
+        default=5,
+        help="Seconds of unrecorded requests before --bench starts (default: 5)",
+    )
+    parser.add_argument(
+        "--report",
+        help="Where --bench or --rightsize writes its JSON report "
+        "(default: bench_report.json / rightsize_report.json)",
+    )
+    parser.add_argument(
+        "--bench-package",
+        action="store_true",
+        help="Time model.tar.gz packaging with each compression setting",
+    )
+    parser.add_argument(
+        "--bench-payload",
+        action="store_true",
+        help="Compare payload size and client CPU time of the request formats",
+    )
+    parser.add_argument(
+        "--bench-preprocess",
+        action="store_true",
+        help="Measure images per second per core of the preprocessing variants",
+    )
+    parser.add_argument(
+        "--bench-invoke",
+        action="store_true",
+        help="Compare per-call overhead of sagemaker.Predictor and EndpointPredictor",
+    )
+    parser.add_argument(
+        "--num-requests",
+        type=int,
+        default=200,
+        help="Requests per client in --bench-invoke (default: 200)",
+    )
+    parser.add_argument(
+        "--live",
+        action="store_true",
+        help="Run --bench-invoke against the deployed endpoint instead of a loopback server",
+    )
+    parser.add_argument(
+        "--bench-imports",
+        action="store_true",
+        help="Measure startup time, import time and memory of each command",
+    )
+    parser.add_argument(
+        "--payload-format",
+        choices=sorted(PAYLOAD_FORMATS),
+        default="json",
+        help="Request body format sent to the endpoint (default: json)",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=["sagemaker", "local", "tflite", "onnx"],
+        default="sagemaker",
+        help="Score with the deployed endpoint, the local SavedModel from --prepare, "
+        "or the TFLite or ONNX model from --prepare --tflite / --onnx",
+    )
+    parser.add_argument(
+        "--num-images",
+        type=int,
+        default=5,
+        help="Number of random images from data/ to score, 0 for all (default: 5)",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=1,
+        help="Maximum number of images per request (default: 1)",
+    )
+    parser.add_argument(
+        "--max-payload-bytes",
+        type=int,
+        default=MAX_PAYLOAD_BYTES,
+        help=f"Maximum request body size per batch (default: {MAX_PAYLOAD_BYTES})",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="Number of requests in flight at once (default: 1)",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=int,
+        default=INVOKE_TIMEOUT_SECONDS,
+        help=f"Per-request read timeout in seconds (default: {INVOKE_TIMEOUT_SECONDS})",
+    )
+    parser.add_argument(
+        "--async-timeout",
+        type=int,
+        default=ASYNC_TIMEOUT_SECONDS,
+        help="How long to wait for each result of a --mode async endpoint in seconds "
+        f"(default: {ASYNC_TIMEOUT_SECONDS})",
+    )
 
     args = parser.parse_args()
 
@@ -0,0 +1,833 @@
+"""
+Lightweight client for the deployed endpoint.
+
+Holds the predict and delete paths of cli.py. Only the standard library and
+boto3 are imported up front. numpy and Pillow are imported when a request
+is built. Real-time endpoints are called through EndpointPredictor, so
+sagemaker is only imported for async endpoints and the local backends.
+TensorFlow is only imported by the local backend; the tflite backend
+prefers a standalone TFLite runtime and the onnx backend needs only
+onnxruntime. So `python cli.py --delete` starts in a fraction of a second,
+and both `--predict` and `--delete` run without TensorFlow installed.
+
+Typical usage example:
+        predictor = make_backend_predictor(payload_format="npy", concurrency=8)
+        result = predictor.predict(build_payload([load_instance(path, "npy")], "npy"))
+        predict(num_images=0, batch_size=8, concurrency=8)
+        predict(backend="tflite", tflite_threads=4)
+        EndpointPredictor(endpoint_name, "npy").invoke(npy_bytes)
+        delete()
+"""
+
+import os
+import io
+import base64
+import json
+import math
+import uuid
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+AWS_REGION = os.environ.get("AWS_REGION", "us-east-1")
+S3_MODELS_BUCKET_NAME = os.environ["S3_MODELS_BUCKET_NAME"]
+BEST_MODEL = "model-mobilenetv2_train_base_True.v1"
+LOCAL_MODEL_PATH = f"./artifacts/{BEST_MODEL}/1"
+# Written by prepare(tflite=True), run by the tflite backend
+LOCAL_TFLITE_PATH = f"./artifacts/{BEST_MODEL}/model.tflite"
+# Written by prepare(onnx=True), run by the onnx backend
+LOCAL_ONNX_PATH = f"./artifacts/{BEST_MODEL}/model.onnx"
+
+data_details = {
+    "image_width": 224,
+    "image_height": 224,
+    "num_channels": 3,
+    "num_classes": 4,
+    "label2index": {"parmigiano": 0, "gruyere": 1, "brie": 2, "gouda": 3},
+    "index2label": {"0": "parmigiano", "1": "gruyere", "2": "brie", "3": "gouda"},
+}
+
+# SageMaker real-time endpoints reject request bodies above 6 MB
+MAX_PAYLOAD_BYTES = 5 * 1024 * 1024
+# Serverless endpoints reject request bodies above 4 MB, with the same
+# headroom for the payload size estimates
+SERVERLESS_MAX_PAYLOAD_BYTES = 3 * 1024 * 1024
+# SageMaker real-time endpoints time out invocations after 60 seconds
+INVOKE_TIMEOUT_SECONDS = 60
+# How often async endpoint results are polled from S3
+ASYNC_POLL_SECONDS = 5
+# How long to wait for each async result. Async requests queue behind each
+# other and may run for up to an hour, so this is far above the real-time limit.
+ASYNC_TIMEOUT_SECONDS = 15 * 60
+
+
+def json_serializers():
+    # sagemaker takes seconds to import, so it is only imported here
+    from sagemaker.serializers import JSONSerializer
+    from sagemaker.deserializers import JSONDeserializer
+
+    return JSONSerializer(), JSONDeserializer()
+
+
+def npy_serializers(dtype):
+    from sagemaker.serializers import NumpySerializer
+    from sagemaker.deserializers import NumpyDeserializer
+
+    return (
+        NumpySerializer(dtype=dtype),
+        NumpyDeserializer(dtype="float32", allow_pickle=False),
+    )
+
+
+# Request body formats understood by the endpoint (see serving/inference.py)
+PAYLOAD_FORMATS = {
+    "json": json_serializers,
+    "npy": lambda: npy_serializers("float32"),
+    # Raw pixels, normalized to [0, 1] by the serving_uint8 signature
+    "npy-uint8": lambda: npy_serializers("uint8"),
+    # Encoded image files, decoded and resized by the serving_bytes signature
+    "jpeg": json_serializers,
+}
+# Client-side image dtype for each tensor payload format
+PAYLOAD_DTYPES = {"json": "float32", "npy": "float32", "npy-uint8": "uint8"}
+# (Content-Type, Accept) of each payload format on the wire, as sent by the
+# serializer/deserializer pairs above
+PAYLOAD_CONTENT_TYPES = {
+    "json": ("application/json", "application/json"),
+    "npy": ("application/x-npy", "application/x-npy"),
+    "npy-uint8": ("application/x-npy", "application/x-npy"),
+    "jpeg": ("application/json", "application/json"),
+}
+# Files picked up by --score, --transform and the local sample set
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def sample_image_files(data_dir="data"):
+    # The local images that --predict and the benchmarks sample from, in a
+    # stable order so every command sees the same set
+    image_files = []
+    for root, dirs, files in os.walk(data_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                image_files.append(os.path.join(root, name))
+    return image_files
+
+
+def load_instance(img_path, payload_format="json", out=None):
+    # One request instance: the encoded file for jpeg, a (224, 224, 3) array
+    # for the tensor formats. img_path can also be a binary file object.
+    # Pass out, e.g. a row of new_batch(), to decode into it in place.
+    if payload_format == "jpeg":
+        if hasattr(img_path, "read"):
+            return img_path.read()
+        with open(img_path, "rb") as f:
+            return f.read()
+    from preprocess import load_image
+
+    return load_image(img_path, dtype=PAYLOAD_DTYPES[payload_format], out=out)
+
+
+def new_batch(size, payload_format="json"):
+    # Preallocated (size, 224, 224, 3) array for a tensor payload format, to
+    # be filled row by row with load_instance(out=...) and passed to
+    # build_payload() without another copy
+    import numpy as np
+    from preprocess import IMAGE_SIZE
+
+    return np.empty((size, *IMAGE_SIZE, 3), dtype=PAYLOAD_DTYPES[payload_format])
+
+
+def build_payload(instances, payload_format="json"):
+    # instances is a list from load_instance(), or an array from new_batch()
+    import numpy as np
+
+    if payload_format == "jpeg":
+        return {
+            "signature_name": "serving_bytes",
+            "instances": [
+                {"b64": base64.b64encode(b).decode("ascii")} for b in instances
+            ],
+        }
+    images = instances if isinstance(instances, np.ndarray) else np.stack(instances)
+    if payload_format == "json":
+        return {"instances": images.tolist()}
+    return images
+
+
+def estimate_payload_bytes(instance, payload_format="json"):
+    if payload_format == "jpeg":
+        # base64 text plus the JSON wrapping
+        return 4 * len(instance) // 3 + 16
+    if payload_format == "json":
+        # Roughly 20 characters of decimal text per float32 value
+        return 20 * instance.size
+    return instance.nbytes
+
+
+def make_batches(items, max_batch_size, max_payload_bytes, item_bytes):
+    # Group items lazily so that no batch exceeds either limit. A single item
+    # larger than max_payload_bytes is still sent on its own.
+    batch = []
+    batch_bytes = 0
+    for item in items:
+        size = item_bytes(item)
+        if batch and (
+            len(batch) >= max_batch_size or batch_bytes + size > max_payload_bytes
+        ):
+            yield batch
+            batch = []
+            batch_bytes = 0
+        batch.append(item)
+        batch_bytes += size
+    if batch:
+        yield batch
+
+
+def print_prediction(img_path, prediction):
+    import numpy as np
+
+    prediction_index = int(np.argmax(prediction))
+    print("Image:", img_path)
+    print(prediction, prediction_index)
+    print("Label:   ", data_details["index2label"][str(prediction_index)], "\n")
+
+
+def parse_predictions(result):
+    # JSON responses wrap the scores, npy responses are the scores themselves
+    if isinstance(result, dict):
+        return result.get("predictions")
+    return result
+
+
+def make_runtime_client(concurrency=1, timeout=INVOKE_TIMEOUT_SECONDS, **client_kwargs):
+    # One pooled sagemaker-runtime client, shared by every worker thread.
+    # Keep-alive probes stop idle pooled connections from being dropped by
+    # NAT gateways and load balancers between bursts, and adaptive retries
+    # also slow the client down when the endpoint throttles.
+    return boto3.client(
+        "sagemaker-runtime",
+        region_name=AWS_REGION,
+        config=Config(
+            max_pool_connections=max(10, concurrency),
+            tcp_keepalive=True,
+            connect_timeout=5,
+            read_timeout=timeout,
+            retries={"max_attempts": 3, "mode": "adaptive"},
+        ),
+        **client_kwargs,
+    )
+
+
+def encode_payload(data, payload_format="json"):
+    # Request body for a payload from build_payload(), the same bytes the
+    # serializers in PAYLOAD_FORMATS produce
+    if isinstance(data, bytes):
+        return data
+    if PAYLOAD_CONTENT_TYPES[payload_format][0] == "application/x-npy":
+        import numpy as np
+
+        buffer = io.BytesIO()
+        np.save(buffer, np.asarray(data, dtype=PAYLOAD_DTYPES[payload_format]))
+        return buffer.getvalue()
+    return json.dumps(data).encode("utf-8")
+
+
+def decode_response(body, accept="application/json"):
+    # Response body parsed like the deserializers in PAYLOAD_FORMATS
+    if accept == "application/x-npy":
+        import numpy as np
+
+        return np.load(io.BytesIO(body), allow_pickle=False)
+    return json.loads(body)
+
+
+class EndpointPredictor:
+    # Predictor for real-time and serverless endpoints that calls
+    # InvokeEndpoint directly instead of going through sagemaker.Session and
+    # sagemaker.Predictor. predict() takes and returns the same shapes,
+    # invoke() is bytes in, bytes out.
+    def __init__(
+        self,
+        endpoint_name,
+        payload_format="json",
+        concurrency=1,
+        timeout=INVOKE_TIMEOUT_SECONDS,
+        runtime_client=None,
+    ):
+        self.endpoint_name = endpoint_name
+        self.payload_format = payload_format
+        self.content_type, self.accept = PAYLOAD_CONTENT_TYPES[payload_format]
+        self.runtime_client = runtime_client or make_runtime_client(concurrency, timeout)
+
+    def invoke(self, body, target_model=None):
+        extra_args = {"TargetModel": target_model} if target_model else {}
+        response = self.runtime_client.invoke_endpoint(
+            EndpointName=self.endpoint_name,
+            Body=body,
+            ContentType=self.content_type,
+            Accept=self.accept,
+            **extra_args,
+        )
+        return response["Body"].read()
+
+    def predict(self, data, target_model=None):
+        body = self.invoke(encode_payload(data, self.payload_format), target_model)
+        return decode_response(body, self.accept)
+
+
+def make_predictor(
+    endpoint_name,
+    payload_format="json",
+    concurrency=1,
+    timeout=INVOKE_TIMEOUT_SECONDS,
+    runtime_client=None,
+):
+    # sagemaker.Predictor, for the async endpoint wrapper and for deleting
+    # endpoints. Plain invocations use EndpointPredictor.
+    import sagemaker
+
+    if runtime_client is None:
+        runtime_client = make_runtime_client(concurrency, timeout)
+    serializer, deserializer = PAYLOAD_FORMATS[payload_format]()
+    return sagemaker.Predictor(
+        endpoint_name=endpoint_name,
+        sagemaker_session=sagemaker.Session(
+            boto_session=boto3.Session(region_name=AWS_REGION),
+            sagemaker_runtime_client=runtime_client,
+        ),
+        serializer=serializer,
+        deserializer=deserializer,
+    )
+
+
+class AsyncEndpointPredictor:
+    # Predictor for an async endpoint with the same predict(data) interface:
+    # the request body is uploaded under input_prefix, queued with
+    # InvokeEndpointAsync, and the result polled from S3 for up to timeout
+    # seconds. A request that times out keeps running on the endpoint, so its
+    # output location is printed to fetch the result later.
+    def __init__(self, predictor, input_prefix, timeout=ASYNC_TIMEOUT_SECONDS):
+        from sagemaker.async_inference import WaiterConfig
+        from sagemaker.predictor_async import AsyncPredictor
+
+        self.endpoint_name = predictor.endpoint_name
+        self.async_predictor = AsyncPredictor(predictor)
+        self.input_prefix = input_prefix
+        self.timeout = timeout
+        self.waiter_config = WaiterConfig(
+            max_attempts=max(1, math.ceil(timeout / ASYNC_POLL_SECONDS)),
+            delay=ASYNC_POLL_SECONDS,
+        )
+
+    def predict(self, data):
+        from sagemaker.exceptions import PollingTimeoutError
+
+        response = self.async_predictor.predict_async(
+            data, input_path=f"{self.input_prefix}/{uuid.uuid4().hex}"
+        )
+        try:
+            return response.get_result(self.waiter_config)
+        except PollingTimeoutError:
+            print(
+                f"No async result after {self.timeout}s, it will be written to "
+                f"{response.output_path}"
+            )
+            raise
+
+
+class TargetModelPredictor:
+    # Routes every request of a multi-model endpoint to one model
+    def __init__(self, predictor, target_model):
+        self.endpoint_name = predictor.endpoint_name
+        self.predictor = predictor
+        self.target_model = target_model
+
+    def predict(self, data):
+        return self.predictor.predict(data, target_model=f"{self.target_model}.tar.gz")
+
+
+def ordered_map(fn, items, concurrency=1, max_pending=None):
+    # Like ThreadPoolExecutor.map, but items are pulled lazily and at most
+    # max_pending calls are queued or running at once (backpressure).
+    # Results are yielded in input order.
+    if max_pending is None:
+        max_pending = 2 * concurrency
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(fn, item))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+class LocalPredictor:
+    # Drop-in stand-in for sagemaker.Predictor that runs the SavedModel
+    # exported by prepare() in-process. Requests go through the same
+    # serializer/deserializer pair and are routed to the same serving
+    # signatures as on the endpoint, so only the network is left out.
+    def __init__(self, model_path, serializer, deserializer):
+        # The only part of the client that needs TensorFlow
+        import tensorflow as tf
+
+        self.tf = tf
+        self.endpoint_name = f"local:{model_path}"
+        self.serializer = serializer
+        self.deserializer = deserializer
+        self.model = tf.saved_model.load(model_path)
+
+    def parse_request(self, body, content_type):
+        # Returns (signature_name, inputs) like TF Serving would see them
+        import numpy as np
+
+        if content_type == "application/x-npy":
+            images = np.load(io.BytesIO(body), allow_pickle=False)
+            if images.dtype == np.uint8:
+                return "serving_uint8", images
+            return "serving_default", images
+        if content_type == "application/x-image":
+            return "serving_bytes", [body]
+
+        request = json.loads(body)
+        instances = request["instances"]
+        if instances and isinstance(instances[0], dict) and "b64" in instances[0]:
+            instances = [base64.b64decode(instance["b64"]) for instance in instances]
+        return request.get("signature_name", "serving_default"), instances
+
+    def run(self, signature_name, inputs):
+        # Signatures are called with a single keyword argument
+        tf = self.tf
+        signature = self.model.signatures[signature_name]
+        input_specs = signature.structured_input_signature[1]
+        input_name, input_spec = next(iter(input_specs.items()))
+        outputs = signature(**{input_name: tf.constant(inputs, dtype=input_spec.dtype)})
+        return next(iter(outputs.values())).numpy()
+
+    def predict(self, data):
+        import numpy as np
+
+        body = self.serializer.serialize(data)
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        signature_name, inputs = self.parse_request(body, self.serializer.CONTENT_TYPE)
+        predictions = self.run(signature_name, inputs)
+
+        accept = self.deserializer.ACCEPT[0]
+        if accept == "application/x-npy":
+            response = io.BytesIO()
+            np.save(response, predictions)
+            response.seek(0)
+        else:
+            response_body = json.dumps({"predictions": predictions.tolist()})
+            response = io.BytesIO(response_body.encode("utf-8"))
+        return self.deserializer.deserialize(response, accept)
+
+
+def load_tflite_runtime():
+    # Returns (Interpreter, OpResolverType) from the smallest TFLite runtime
+    # installed. ai-edge-litert and tflite-runtime are a few MB and import
+    # in milliseconds, TensorFlow is the fallback.
+    try:
+        from ai_edge_litert.interpreter import Interpreter, OpResolverType
+    except ImportError:
+        try:
+            from tflite_runtime.interpreter import Interpreter, OpResolverType
+        except ImportError:
+            import tensorflow as tf
+
+            Interpreter = tf.lite.Interpreter
+            OpResolverType = tf.lite.experimental.OpResolverType
+    return Interpreter, OpResolverType
+
+
+def make_tflite_interpreter(model, num_threads=None, xnnpack=True):
+    # model is a .tflite file name or the flatbuffer bytes. The default
+    # resolver hands every float op XNNPACK supports to the XNNPACK
+    # delegate; xnnpack=False runs the reference builtin kernels instead.
+    Interpreter, OpResolverType = load_tflite_runtime()
+    source = {"model_content": model} if isinstance(model, bytes) else {"model_path": model}
+    interpreter = Interpreter(
+        **source,
+        num_threads=num_threads,
+        experimental_op_resolver_type=(
+            OpResolverType.AUTO if xnnpack else OpResolverType.BUILTIN_WITHOUT_DEFAULT_DELEGATES
+        ),
+    )
+    interpreter.allocate_tensors()
+    return interpreter
+
+
+def run_tflite(interpreter, images):
+    # Probabilities for a float32 batch (N, H, W, C). Tensors are only
+    # reallocated when the batch size changes.
+    import numpy as np
+
+    input_details = interpreter.get_input_details()[0]
+    if list(input_details["shape"]) != list(images.shape):
+        interpreter.resize_tensor_input(input_details["index"], images.shape)
+        interpreter.allocate_tensors()
+    interpreter.set_tensor(input_details["index"], images.astype(np.float32, copy=False))
+    interpreter.invoke()
+    output_details = interpreter.get_output_details()[0]
+    return interpreter.get_tensor(output_details["index"])
+
+
+def float_images(signature_name, inputs):
+    # float32 (N, 224, 224, 3) batch in [0, 1] for models that only have the
+    # input of serving_default. uint8 pixels and encoded images are
+    # converted here the way serving_uint8 and serving_bytes would.
+    import numpy as np
+
+    if signature_name == "serving_bytes":
+        from preprocess import load_image
+
+        return np.stack([load_image(io.BytesIO(image_bytes)) for image_bytes in inputs])
+    images = np.asarray(inputs, dtype=np.float32)
+    if signature_name == "serving_uint8":
+        images /= 255.0
+    return images
+
+
+class TFLitePredictor(LocalPredictor):
+    # LocalPredictor that runs the .tflite model from prepare(tflite=True)
+    # instead of the SavedModel, without loading TensorFlow when a
+    # standalone TFLite runtime is installed
+    def __init__(self, model_path, serializer, deserializer, num_threads=None, xnnpack=True):
+        self.endpoint_name = f"tflite:{model_path}"
+        self.serializer = serializer
+        self.deserializer = deserializer
+        self.interpreter = make_tflite_interpreter(model_path, num_threads, xnnpack)
+        # An interpreter holds its tensors in place, one request at a time
+        self.lock = threading.Lock()
+
+    def run(self, signature_name, inputs):
+        images = float_images(signature_name, inputs)
+        with self.lock:
+            return run_tflite(self.interpreter, images)
+
+
+class ONNXPredictor(LocalPredictor):
+    # LocalPredictor that runs the model.onnx from prepare(onnx=True) on
+    # ONNX Runtime's CPU provider. One session serves every thread:
+    # intra_op_threads parallelize each batch, and the memory arena keeps
+    # activation buffers between calls instead of reallocating them.
+    def __init__(self, model_path, serializer, deserializer, intra_op_threads=None):
+        import onnxruntime as ort
+
+        self.endpoint_name = f"onnx:{model_path}"
+        self.serializer = serializer
+        self.deserializer = deserializer
+        options = ort.SessionOptions()
+        # The export already applied the portable optimizations, this adds
+        # the layout transforms for the CPU we are running on
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.enable_cpu_mem_arena = True
+        options.enable_mem_pattern = True
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        self.session = ort.InferenceSession(
+            model_path, options, providers=["CPUExecutionProvider"]
+        )
+        self.input_name = self.session.get_inputs()[0].name
+
+    def run(self, signature_name, inputs):
+        images = float_images(signature_name, inputs)
+        return self.session.run(None, {self.input_name: images})[0]
+
+
+def make_backend_predictor(
+    backend="sagemaker",
+    payload_format="json",
+    concurrency=1,
+    timeout=INVOKE_TIMEOUT_SECONDS,
+    target_model=None,
+    tflite_threads=None,
+    onnx_threads=None,
+    async_timeout=ASYNC_TIMEOUT_SECONDS,
+):
+    if backend == "local":
+        serializer, deserializer = PAYLOAD_FORMATS[payload_format]()
+        return LocalPredictor(LOCAL_MODEL_PATH, serializer, deserializer)
+    if backend == "tflite":
+        serializer, deserializer = PAYLOAD_FORMATS[payload_format]()
+        return TFLitePredictor(
+            LOCAL_TFLITE_PATH, serializer, deserializer, num_threads=tflite_threads
+        )
+    if backend == "onnx":
+        serializer, deserializer = PAYLOAD_FORMATS[payload_format]()
+        return ONNXPredictor(
+            LOCAL_ONNX_PATH, serializer, deserializer, intra_op_threads=onnx_threads
+        )
+    endpoint_config = load_endpoint_config()
+    if endpoint_config.get("mode") == "async":
+        # The runtime call only queues the request, so it never needs the
+        # long read timeout; async_timeout bounds the wait for the S3 result
+        predictor = make_predictor(
+            endpoint_config["endpoint_name"], payload_format, concurrency=concurrency
+        )
+        return AsyncEndpointPredictor(
+            predictor, endpoint_config["async"]["input_prefix"], timeout=async_timeout
+        )
+    predictor = EndpointPredictor(
+        endpoint_config["endpoint_name"],
+        payload_format,
+        concurrency=concurrency,
+        timeout=timeout,
+    )
+    if "multi_model" in endpoint_config:
+        return TargetModelPredictor(
+            predictor, target_model or endpoint_config["multi_model"]["default_target_model"]
+        )
+    return predictor
+
+
+def load_endpoint_config():
+    # Load endpoint configuration
+    try:
+        with open("endpoint_config.json", "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        print("Error: endpoint_config.json not found. Please deploy the model first.")
+        print("You can also manually set the endpoint name in the code.")
+        return {
+            "endpoint_name": BEST_MODEL.replace(".", "-").replace("_", "-") + "-endpoint"
+        }
+
+
+def cap_payload_bytes(max_payload_bytes, backend="sagemaker"):
+    # Lower max_payload_bytes to what the endpoint in endpoint_config.json
+    # accepts, so batches for a serverless endpoint stay under its limit
+    if backend != "sagemaker" or not os.path.exists("endpoint_config.json"):
+        return max_payload_bytes
+    if load_endpoint_config().get("mode") != "serverless":
+        return max_payload_bytes
+    if max_payload_bytes > SERVERLESS_MAX_PAYLOAD_BYTES:
+        print(
+            f"Capping batches at {SERVERLESS_MAX_PAYLOAD_BYTES} bytes "
+            "for the serverless endpoint"
+        )
+        return SERVERLESS_MAX_PAYLOAD_BYTES
+    return max_payload_bytes
+
+
+def predict(
+    payload_format="json",
+    num_images=5,
+    batch_size=1,
+    max_payload_bytes=MAX_PAYLOAD_BYTES,
+    concurrency=1,
+    timeout=INVOKE_TIMEOUT_SECONDS,
+    backend="sagemaker",
+    target_model=None,
+    tflite_threads=None,
+    onnx_threads=None,
+    async_timeout=ASYNC_TIMEOUT_SECONDS,
+):
+    # Build a Predictor that speaks the requested payload format
+    predictor = make_backend_predictor(
+        backend,
+        payload_format,
+        concurrency=concurrency,
+        timeout=timeout,
+        target_model=target_model,
+        tflite_threads=tflite_threads,
+        onnx_threads=onnx_threads,
+        async_timeout=async_timeout,
+    )
+    endpoint_name = predictor.endpoint_name
+    max_payload_bytes = cap_payload_bytes(max_payload_bytes, backend)
+
+    # Get a sample image to predict
+    image_files = sample_image_files()
+    print("image_files:", image_files[:5])
+
+    if not image_files:
+        print("No image files found in data directory")
+        return
+
+    # Score a random sample, or every image when num_images is 0
+    if num_images > 0:
+        import numpy as np
+
+        image_samples = np.random.randint(
+            0, high=len(image_files), size=min(num_images, len(image_files))
+        )
+        image_files = [image_files[img_idx] for img_idx in image_samples]
+
+    # Pack several images into one "instances" array per request
+    if payload_format == "jpeg":
+        # Batches are sized by the encoded files, so those are read first
+        images = (
+            (img_path, load_instance(img_path, payload_format)) for img_path in image_files
+        )
+        instance_bytes = None
+    else:
+        # Every image decodes to the same shape, so paths are batched up
+        # front and each batch is decoded into one array by invoke()
+        images = ((img_path, None) for img_path in image_files)
+        instance_bytes = estimate_payload_bytes(new_batch(1, payload_format)[0], payload_format)
+    batches = make_batches(
+        images,
+        max_batch_size=batch_size,
+        max_payload_bytes=max_payload_bytes,
+        item_bytes=lambda item: instance_bytes or estimate_payload_bytes(item[1], payload_format),
+    )
+
+    def invoke(batch):
+        img_paths = [img_path for img_path, _ in batch]
+        if payload_format == "jpeg":
+            instances = [arr for _, arr in batch]
+        else:
+            instances = new_batch(len(batch), payload_format)
+            for i, img_path in enumerate(img_paths):
+                load_instance(img_path, payload_format, out=instances[i])
+        payload = build_payload(instances, payload_format)
+        try:
+            return img_paths, predictor.predict(payload), None
+        except Exception as e:
+            return img_paths, None, e
+
+    # Invoke from a bounded worker pool, printing results in input order
+    for img_paths, result, error in ordered_map(invoke, batches, concurrency):
+        if error is not None:
+            print(f"Error invoking endpoint: {error}")
+            print(f"Make sure the endpoint '{endpoint_name}' exists and is in service")
+            continue
+
+        predictions = parse_predictions(result)
+        if predictions is not None and len(predictions) == len(img_paths):
+            # Split the batched scores back out per file
+            for img_path, prediction in zip(img_paths, predictions):
+                print_prediction(img_path, prediction)
+        else:
+            print("Unexpected response format:", result)
+
+
+def remove_autoscaling(
+    endpoint_name, variant_name="AllTraffic", autoscaling_client=None
+):
+    # Deregistering the target also deletes its scaling policies
+    if autoscaling_client is None:
+        autoscaling_client = boto3.client(
+            "application-autoscaling", region_name=AWS_REGION
+        )
+    resource_id = f"endpoint/{endpoint_name}/variant/{variant_name}"
+    try:
+        autoscaling_client.deregister_scalable_target(
+            ServiceNamespace="sagemaker",
+            ResourceId=resource_id,
+            ScalableDimension="sagemaker:variant:DesiredInstanceCount",
+        )
+        print(f"Removed autoscaling from {resource_id}")
+    except ClientError as e:
+        # Endpoints deployed without autoscaling have no scalable target
+        if e.response["Error"]["Code"] not in ("ObjectNotFoundException", "ValidationException"):
+            print(f"Warning: could not remove autoscaling from {resource_id}: {e}")
+
+
+def delete():
+    # Load endpoint configuration if present
+    endpoint_name = None
+    endpoint_config = {}
+    try:
+        with open("endpoint_config.json", "r") as f:
+            endpoint_config = json.load(f)
+            endpoint_name = endpoint_config.get("endpoint_name")
+    except FileNotFoundError:
+        pass
+
+    sm_client = boto3.client("sagemaker", region_name=AWS_REGION)
+    s3_client = boto3.client("s3", region_name=AWS_REGION)
+
+    # Delete endpoint
+    if endpoint_name:
+        remove_autoscaling(endpoint_name)
+        try:
+            print(f"Deleting endpoint: {endpoint_name}")
+            sm_client.delete_endpoint(EndpointName=endpoint_name)
+        except ClientError as e:
+            print(f"Warning: could not delete endpoint {endpoint_name}: {e}")
+
+    # Try to derive endpoint-config and model names from our naming scheme
+    model_name = BEST_MODEL.replace(".", "-").replace("_", "-")
+    endpoint_config_name = None
+
+    # Best-effort: list endpoint configs and delete ones referencing our model
+    try:
+        paginator = sm_client.get_paginator("list_endpoint_configs")
+        for page in paginator.paginate():
+            for ec in page.get("EndpointConfigs", []):
+                name = ec.get("EndpointConfigName", "")
+                if model_name in name:
+                    endpoint_config_name = name
+                    print(f"Deleting endpoint config: {endpoint_config_name}")
+                    try:
+                        sm_client.delete_endpoint_config(EndpointConfigName=endpoint_config_name)
+                    except ClientError as e:
+                        print(f"Warning: could not delete endpoint config {endpoint_config_name}: {e}")
+    except ClientError as e:
+        print(f"Warning: list_endpoint_configs failed: {e}")
+
+    # Delete model
+    try:
+        print(f"Deleting model: {model_name}")
+        sm_client.delete_model(ModelName=model_name)
+    except ClientError as e:
+        print(f"Warning: could not delete model {model_name}: {e}")
+
+    # Models created by --update
+    for updated_model_name in endpoint_config.get("models", []):
+        try:
+            print(f"Deleting model: {updated_model_name}")
+            sm_client.delete_model(ModelName=updated_model_name)
+        except ClientError as e:
+            print(f"Warning: could not delete model {updated_model_name}: {e}")
+
+    # Rollback alarms created by --update
+    if endpoint_config.get("alarms"):
+        cloudwatch_client = boto3.client("cloudwatch", region_name=AWS_REGION)
+        alarm_names = ", ".join(endpoint_config["alarms"])
+        try:
+            print(f"Deleting alarms: {alarm_names}")
+            cloudwatch_client.delete_alarms(AlarmNames=endpoint_config["alarms"])
+        except ClientError as e:
+            print(f"Warning: could not delete alarms {alarm_names}: {e}")
+
+    # The multi-model endpoint's model, if one was deployed. Artifacts under
+    # MULTI_MODEL_PREFIX are shared with other variants and kept.
+    if "multi_model" in endpoint_config:
+        try:
+            print(f"Deleting model: {model_name}-mme")
+            sm_client.delete_model(ModelName=f"{model_name}-mme")
+        except ClientError as e:
+            print(f"Warning: could not delete model {model_name}-mme: {e}")
+
+    # Delete S3 artifacts under BEST_MODEL/
+    prefix = f"{BEST_MODEL}/"
+    try:
+        print(f"Deleting S3 artifacts s3://{S3_MODELS_BUCKET_NAME}/{prefix}")
+        paginator = s3_client.get_paginator("list_objects_v2")
+        to_delete = []
+        for page in paginator.paginate(Bucket=S3_MODELS_BUCKET_NAME, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                to_delete.append({"Key": obj["Key"]})
+                if len(to_delete) == 1000:
+                    s3_client.delete_objects(Bucket=S3_MODELS_BUCKET_NAME, Delete={"Objects": to_delete})
+                    to_delete = []
+        if to_delete:
+            s3_client.delete_objects(Bucket=S3_MODELS_BUCKET_NAME, Delete={"Objects": to_delete})
+    except ClientError as e:
+        print(f"Warning: could not delete S3 artifacts: {e}")
+    
+    # Remove local endpoint_config.json
+    try:
+        os.remove("endpoint_config.json")
+        print("Removed endpoint_config.json")
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,113 @@
+"""
+Inference graph optimizations applied at export time.
+
+Each serving function is frozen (variables become constants) and run
+through Grappler offline with an explicit list of optimizers, so the graph
+TF Serving loads is already folded and pruned instead of relying on what
+the server does at load time. Optionally the result is wrapped in an XLA
+jit_compile function.
+
+Typical usage example:
+        serving_functions = make_serving_functions(prediction_model)
+        save_optimized(serving_functions, "artifacts/model/1", jit_compile=True)
+"""
+
+import inspect
+
+import tensorflow as tf
+from tensorflow.core.protobuf import config_pb2, meta_graph_pb2, rewriter_config_pb2
+from tensorflow.python.framework.convert_to_constants import (
+    convert_variables_to_constants_v2,
+)
+from tensorflow.python.grappler import tf_optimizer
+
+# Grappler passes run on the frozen graph, in this order:
+#   function        inline function calls so the passes below see one graph
+#   debug_stripper  drop Assert/Print/CheckNumerics
+#   constfold       fold subgraphs of constants, e.g. weights times BN scale
+#   arithmetic      simplify and fuse arithmetic
+#   dependency      remove control dependencies and no-op Identity nodes
+#   pruning         drop nodes that do not lead to the outputs
+#   layout          pick NHWC/NCHW per device
+#   remap           fuse Conv2D + BiasAdd + Relu and similar patterns
+#   loop            hoist loop invariants out of map_fn
+GRAPPLER_OPTIMIZERS = [
+    "function",
+    "debug_stripper",
+    "constfold",
+    "arithmetic",
+    "dependency",
+    "pruning",
+    "layout",
+    "remap",
+    "loop",
+]
+
+
+def run_grappler(frozen_func, optimizers=GRAPPLER_OPTIMIZERS):
+    # Returns the optimized GraphDef of a frozen ConcreteFunction
+    graph_def = frozen_func.graph.as_graph_def()
+    meta_graph = tf.compat.v1.train.export_meta_graph(
+        graph_def=graph_def, graph=frozen_func.graph
+    )
+
+    # Tell Grappler which nodes must survive pruning
+    fetch_collection = meta_graph_pb2.CollectionDef()
+    for tensor in frozen_func.inputs + frozen_func.outputs:
+        fetch_collection.node_list.value.append(tensor.name)
+    meta_graph.collection_def["train_op"].CopyFrom(fetch_collection)
+
+    config = config_pb2.ConfigProto()
+    rewrite_options = config.graph_options.rewrite_options
+    rewrite_options.optimizers.extend(optimizers)
+    rewrite_options.meta_optimizer_iterations = rewriter_config_pb2.RewriterConfig.TWO
+    return tf_optimizer.OptimizeGraph(config, meta_graph)
+
+
+def optimize_function(fn, input_spec, jit_compile=False):
+    # Freeze and optimize fn, returning a tf.function with the same input
+    # signature that runs the optimized graph
+    concrete_func = tf.function(fn).get_concrete_function(input_spec)
+    frozen_func = convert_variables_to_constants_v2(concrete_func)
+    optimized_graph_def = run_grappler(frozen_func)
+
+    input_names = [tensor.name for tensor in frozen_func.inputs]
+    output_names = [tensor.name for tensor in frozen_func.outputs]
+
+    def import_graph():
+        tf.compat.v1.import_graph_def(optimized_graph_def, name="")
+
+    wrapped = tf.compat.v1.wrap_function(import_graph, [])
+    optimized_func = wrapped.prune(
+        feeds=[wrapped.graph.get_tensor_by_name(name) for name in input_names],
+        fetches=[wrapped.graph.get_tensor_by_name(name) for name in output_names],
+    )
+
+    # Keep the input name of fn, clients and the local backend address
+    # signatures by it
+    input_name = next(iter(inspect.signature(fn).parameters))
+    signature_spec = tf.TensorSpec(input_spec.shape, input_spec.dtype, name=input_name)
+
+    # XLA cannot take string inputs or decode images, so signatures over
+    # encoded bytes stay uncompiled
+    if input_spec.dtype == tf.string:
+        jit_compile = False
+
+    @tf.function(input_signature=[signature_spec], jit_compile=jit_compile)
+    def serving_fn(inputs):
+        return optimized_func(inputs)[0]
+
+    return serving_fn
+
+
+def save_optimized(serving_functions, export_path, jit_compile=False):
+    # serving_functions maps signature names to (fn, input_spec), as
+    # returned by make_serving_functions(). The first one also becomes
+    # serving_default.
+    module = tf.Module()
+    signatures = {}
+    for i, (name, (fn, input_spec)) in enumerate(serving_functions.items()):
+        serving_fn = optimize_function(fn, input_spec, jit_compile=jit_compile)
+        setattr(module, name, serving_fn)
+        signatures["serving_default" if i == 0 else name] = serving_fn
+    tf.saved_model.save(module, export_path, signatures=signatures)
@@ -0,0 +1,84 @@
+"""
+Multi-threaded gzip compression, in the style of pigz.
+
+The input is cut into blocks that are deflated in parallel. Each block is
+primed with the last 32 KB of the block before it and ends on a byte
+boundary (Z_SYNC_FLUSH), so the compressed blocks simply concatenate into one
+standard gzip stream that any gunzip (or SageMaker) can read.
+
+Typical usage example:
+        with open("model.tar.gz", "wb") as f, ParallelGzipWriter(f, level=6) as gz:
+            with tarfile.open(fileobj=gz, mode="w|") as tar:
+                tar.add("1")
+"""
+
+import io
+import os
+import struct
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Deflate can only refer back this far, so it is all the history a block needs
+WINDOW_SIZE = 32 * 1024
+
+
+def compress_block(block, dictionary, level, last):
+    options = {"zdict": dictionary} if dictionary else {}
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS, **options)
+    flush_mode = zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH
+    return compressor.compress(block) + compressor.flush(flush_mode)
+
+
+class ParallelGzipWriter(io.RawIOBase):
+    # Writable file object that gzips into fileobj using threads. zlib
+    # releases the GIL while compressing, so blocks really run in parallel.
+    def __init__(self, fileobj, level=6, threads=None, block_size=1024 * 1024):
+        self.fileobj = fileobj
+        self.level = level
+        self.block_size = block_size
+        self.threads = threads or os.cpu_count() or 1
+        self.executor = ThreadPoolExecutor(max_workers=self.threads)
+        self.pending = deque()
+        self.buffer = bytearray()
+        self.dictionary = b""
+        self.crc = 0
+        self.size = 0
+        # gzip header: deflate, no flags, mtime, unknown OS
+        header = struct.pack("<BBBBIBB", 0x1F, 0x8B, 8, 0, int(time.time()), 0, 255)
+        self.fileobj.write(header)
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.crc = zlib.crc32(data, self.crc)
+        self.size += len(data)
+        self.buffer.extend(data)
+        # Keep the last partial block back, the final block is compressed
+        # differently (Z_FINISH) and is only known on close()
+        while len(self.buffer) > self.block_size:
+            block = bytes(self.buffer[: self.block_size])
+            del self.buffer[: self.block_size]
+            self.submit(block, last=False)
+        return len(data)
+
+    def submit(self, block, last):
+        self.pending.append(
+            self.executor.submit(compress_block, block, self.dictionary, self.level, last)
+        )
+        self.dictionary = (self.dictionary + block[-WINDOW_SIZE:])[-WINDOW_SIZE:]
+        # Bound memory: write finished blocks out in order
+        while len(self.pending) > 2 * self.threads or (last and self.pending):
+            self.fileobj.write(self.pending.popleft().result())
+
+    def close(self):
+        if self.closed:
+            return
+        self.submit(bytes(self.buffer), last=True)
+        self.buffer = bytearray()
+        self.executor.shutdown()
+        trailer = struct.pack("<II", self.crc & 0xFFFFFFFF, self.size & 0xFFFFFFFF)
+        self.fileobj.write(trailer)
+        super().close()
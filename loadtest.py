@@ -0,0 +1,148 @@
+"""
+Load generator and latency histogram for benchmarking the endpoint.
+
+Typical usage example:
+        report = run_load_test(invoke, concurrency=8, duration=60)
+        report = run_load_test(invoke, rps=50, concurrency=32, duration=60)
+"""
+
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class LatencyHistogram:
+    # Log-linear buckets in the spirit of HdrHistogram: values below
+    # 2**sub_bucket_bits microseconds are exact, larger values share buckets
+    # whose width grows with the value, keeping the relative error below
+    # 2 / 2**sub_bucket_bits (about 1.6% with the default of 7 bits).
+    def __init__(self, sub_bucket_bits=7):
+        self.sub_bucket_bits = sub_bucket_bits
+        self.counts = {}
+        self.total = 0
+        self.sum = 0
+        self.min = None
+        self.max = None
+        self.lock = threading.Lock()
+
+    def bucket(self, value_us):
+        # Returns (lowest, highest) value that share the bucket of value_us
+        shift = max(0, value_us.bit_length() - self.sub_bucket_bits)
+        lowest = (value_us >> shift) << shift
+        return lowest, lowest + (1 << shift) - 1
+
+    def record(self, seconds):
+        value_us = max(0, int(seconds * 1e6))
+        lowest, _ = self.bucket(value_us)
+        with self.lock:
+            self.counts[lowest] = self.counts.get(lowest, 0) + 1
+            self.total += 1
+            self.sum += value_us
+            self.min = value_us if self.min is None else min(self.min, value_us)
+            self.max = value_us if self.max is None else max(self.max, value_us)
+
+    def percentile(self, p):
+        # Highest value equivalent to the p-th percentile, in microseconds
+        if self.total == 0:
+            return None
+        target = max(1, math.ceil(p / 100.0 * self.total))
+        seen = 0
+        for lowest in sorted(self.counts):
+            seen += self.counts[lowest]
+            if seen >= target:
+                return min(self.bucket(lowest)[1], self.max)
+        return self.max
+
+    def summary_ms(self):
+        if self.total == 0:
+            return {}
+        summary = {
+            "min": self.min / 1000,
+            "mean": self.sum / self.total / 1000,
+            "max": self.max / 1000,
+        }
+        for p in (50, 90, 99, 99.9):
+            summary[f"p{p:g}"] = self.percentile(p) / 1000
+        return summary
+
+    def buckets(self):
+        # [highest value in us, count] pairs, for plotting or merging runs
+        return [
+            [self.bucket(lowest)[1], self.counts[lowest]] for lowest in sorted(self.counts)
+        ]
+
+
+def run_load_test(invoke, rps=None, concurrency=1, duration=60, warmup=0):
+    # Calls invoke() for duration seconds and returns a report dict.
+    #
+    # Without rps the test is closed-loop: concurrency workers send the next
+    # request as soon as the previous one returns. With rps the test is
+    # open-loop: requests are scheduled at a fixed rate and latency is
+    # measured from the scheduled start, so queueing behind a saturated
+    # endpoint shows up in the tail instead of being hidden (coordinated
+    # omission).
+    histogram = LatencyHistogram()
+    errors = {}
+    errors_lock = threading.Lock()
+
+    def timed_call(scheduled_at):
+        try:
+            invoke()
+        except Exception as e:
+            with errors_lock:
+                name = type(e).__name__
+                errors[name] = errors.get(name, 0) + 1
+            return
+        histogram.record(time.perf_counter() - scheduled_at)
+
+    # Warm up connections and the model without recording anything
+    warmup_end = time.perf_counter() + warmup
+    while time.perf_counter() < warmup_end:
+        try:
+            invoke()
+        except Exception:
+            pass
+
+    start = time.perf_counter()
+    deadline = start + duration
+    if rps:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            sent = 0
+            while True:
+                scheduled_at = start + sent / rps
+                if scheduled_at >= deadline:
+                    break
+                delay = scheduled_at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(timed_call, scheduled_at)
+                sent += 1
+    else:
+
+        def worker():
+            while time.perf_counter() < deadline:
+                timed_call(time.perf_counter())
+
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    elapsed = time.perf_counter() - start
+
+    error_count = sum(errors.values())
+    requests = histogram.total + error_count
+    return {
+        "mode": "fixed_rps" if rps else "fixed_concurrency",
+        "target_rps": rps,
+        "concurrency": concurrency,
+        "duration_s": elapsed,
+        "requests": requests,
+        "errors": error_count,
+        "errors_by_type": errors,
+        "error_rate": error_count / requests if requests else 0.0,
+        "throughput_rps": histogram.total / elapsed if elapsed else 0.0,
+        "latency_ms": histogram.summary_ms(),
+        "histogram_us": histogram.buckets(),
+    }
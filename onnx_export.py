@@ -0,0 +1,50 @@
+"""
+ONNX export of the classifier.
+
+Converts the Keras model with tf2onnx, then runs ONNX Runtime's graph
+optimizer over the result offline, so the model.onnx that the onnx backend
+loads is already folded and fused.
+
+Typical usage example:
+        convert_onnx(prediction_model, "artifacts/model/model.onnx")
+        convert_onnx(prediction_model, "artifacts/model/model.onnx", opset=13)
+"""
+
+import os
+
+import onnxruntime as ort
+import tensorflow as tf
+import tf2onnx
+
+ONNX_OPSET = 17
+# Name of the float32 (N, 224, 224, 3) input, like serving_default
+ONNX_INPUT_NAME = "images"
+
+
+def convert_onnx(prediction_model, output_path, opset=ONNX_OPSET):
+    input_signature = [
+        tf.TensorSpec(
+            [None, *prediction_model.input_shape[1:]], tf.float32, name=ONNX_INPUT_NAME
+        )
+    ]
+
+    @tf.function(input_signature=input_signature)
+    def serve(images):
+        return prediction_model(images, training=False)
+
+    # tf2onnx folds constants and cancels the NHWC <-> NCHW transposes
+    # around convolutions while converting
+    raw_path = output_path + ".raw"
+    tf2onnx.convert.from_function(
+        serve, input_signature=input_signature, opset=opset, output_path=raw_path
+    )
+
+    # ORT_ENABLE_EXTENDED adds node fusions (Conv + Add + Relu, ...) to the
+    # basic constant folding and redundant node removal. ORT_ENABLE_ALL
+    # would also bake in NCHWc layouts for the CPU running the export, so
+    # that level is left to the session at load time.
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED
+    options.optimized_model_filepath = output_path
+    ort.InferenceSession(raw_path, options, providers=["CPUExecutionProvider"])
+    os.remove(raw_path)
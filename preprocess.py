@@ -0,0 +1,39 @@
+"""
+Image preprocessing for the cheese classifier.
+
+Turns image files into the (224, 224, 3) tensors the model expects, with a
+fast path for JPEGs and optional reuse of preallocated output buffers.
+
+Typical usage example:
+        arr = load_image("data/brie-1.jpg")
+        arr = load_image("data/brie-1.jpg", dtype=np.uint8)
+        load_image("data/brie-1.jpg", out=batch[i])
+"""
+
+import numpy as np
+from PIL import Image
+
+IMAGE_SIZE = (224, 224)
+
+
+def load_image(src, size=IMAGE_SIZE, dtype=np.float32, out=None, draft=True):
+    # src can be a file name or a binary file object. float32 output is
+    # scaled to [0, 1], uint8 output keeps the raw pixels so the server can
+    # normalize them. Pass out to fill an existing array instead of
+    # allocating a new one.
+    with Image.open(src) as img:
+        if draft:
+            # Let the JPEG decoder downscale in the DCT domain (by 1/2, 1/4
+            # or 1/8) while staying at least as large as size. No-op for
+            # other formats.
+            img.draft("RGB", size)
+        img = img.convert("RGB").resize(size)
+        pixels = np.asarray(img)
+
+    if out is None:
+        out = np.empty(pixels.shape, dtype=dtype)
+    if out.dtype == np.uint8:
+        np.copyto(out, pixels)
+    else:
+        np.divide(pixels, np.float32(255.0), out=out, dtype=np.float32)
+    return out
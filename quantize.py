@@ -0,0 +1,60 @@
+"""
+Post-training quantization of the classifier with TensorFlow Lite.
+
+Converts the Keras model into .tflite variants that trade accuracy for size
+and CPU latency. client.py runs them with the TFLite interpreter.
+
+Typical usage example:
+        tflite_model = convert_tflite(prediction_model, "dynamic")
+        tflite_model = convert_tflite(prediction_model, "int8", representative_images=images)
+"""
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.python.framework.convert_to_constants import (
+    convert_variables_to_constants_v2,
+)
+
+# What each variant stores and computes in:
+#   float32  plain conversion, nothing quantized
+#   dynamic  int8 weights, activations quantized on the fly per batch
+#   float16  float16 weights, upcast to float32 for compute on CPU
+#   int8     int8 weights and activations, activation ranges calibrated on
+#            representative images; input and output stay float32 so
+#            callers feed the same tensors as to the SavedModel
+TFLITE_VARIANTS = ["float32", "dynamic", "float16", "int8"]
+
+
+def convert_tflite(prediction_model, variant="float32", representative_images=None):
+    # Returns the .tflite flatbuffer of prediction_model as bytes.
+    # representative_images is a float32 array (N, H, W, C) in [0, 1],
+    # required for int8.
+    if variant not in TFLITE_VARIANTS:
+        raise ValueError(f"Unknown TFLite variant: {variant}")
+
+    input_shape = [None, *prediction_model.input_shape[1:]]
+
+    @tf.function(input_signature=[tf.TensorSpec(input_shape, tf.float32)])
+    def serve(images):
+        return prediction_model(images, training=False)
+
+    # Freeze the weights into constants, the calibrator cannot read
+    # resource variables
+    frozen_func = convert_variables_to_constants_v2(serve.get_concrete_function())
+    converter = tf.lite.TFLiteConverter.from_concrete_functions([frozen_func])
+    if variant != "float32":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if variant == "float16":
+        converter.target_spec.supported_types = [tf.float16]
+    if variant == "int8":
+        if representative_images is None or len(representative_images) == 0:
+            raise ValueError("int8 quantization needs representative images")
+
+        def representative_dataset():
+            for image in representative_images:
+                yield [image[np.newaxis].astype(np.float32)]
+
+        converter.representative_dataset = representative_dataset
+        # Fail instead of silently falling back to float kernels
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    return converter.convert()
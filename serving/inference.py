@@ -0,0 +1,60 @@
+"""
+Request/response handlers for the SageMaker TensorFlow Serving container.
+
+`python cli.py --prepare` packages this file into model.tar.gz as
+code/inference.py, which the container picks up automatically.
+
+Supported request content types:
+        application/json   TF Serving REST body, e.g. {"instances": [...]}
+        application/x-npy  a NumPy .npy batch of images (N, 224, 224, 3), either
+                           float32 in [0, 1] or raw uint8 pixels
+        application/x-image  one encoded image file (JPEG, PNG, ...)
+"""
+
+import io
+import json
+import base64
+import numpy as np
+
+JSON_CONTENT_TYPE = "application/json"
+NPY_CONTENT_TYPE = "application/x-npy"
+IMAGE_CONTENT_TYPE = "application/x-image"
+
+
+def input_handler(data, context):
+    if context.request_content_type == JSON_CONTENT_TYPE:
+        # Pass TF Serving REST requests through untouched
+        return data.read().decode("utf-8")
+
+    if context.request_content_type == NPY_CONTENT_TYPE:
+        # Decode the binary tensor here, next to the model, instead of
+        # shipping decimal text over the network
+        instances = np.load(io.BytesIO(data.read()), allow_pickle=False)
+        if instances.dtype == np.uint8:
+            # Raw pixels are normalized in-graph by the serving_uint8 signature
+            return json.dumps(
+                {"signature_name": "serving_uint8", "instances": instances.tolist()}
+            )
+        return json.dumps({"instances": instances.tolist()})
+
+    if context.request_content_type == IMAGE_CONTENT_TYPE:
+        # Decoded and resized in-graph by the serving_bytes signature
+        image_b64 = base64.b64encode(data.read()).decode("ascii")
+        return json.dumps(
+            {"signature_name": "serving_bytes", "instances": [{"b64": image_b64}]}
+        )
+
+    raise ValueError(f"Unsupported content type: {context.request_content_type}")
+
+
+def output_handler(response, context):
+    if response.status_code != 200:
+        raise ValueError(response.content.decode("utf-8"))
+
+    if context.accept_header == NPY_CONTENT_TYPE:
+        predictions = json.loads(response.content)["predictions"]
+        buffer = io.BytesIO()
+        np.save(buffer, np.asarray(predictions, dtype=np.float32))
+        return buffer.getvalue(), NPY_CONTENT_TYPE
+
+    return response.content, JSON_CONTENT_TYPE
@@ -0,0 +1,10 @@
+import os
+
+# cli.py and client.py read these at import time. Dummy credentials keep
+# boto3 (and moto) from looking for a real AWS account.
+os.environ.setdefault("S3_MODELS_BUCKET_NAME", "test-models-bucket")
+os.environ.setdefault("AWS_REGION", "us-east-1")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+os.environ.setdefault("SAGEMAKER_SUPPRESS_V2_WARNING", "1")
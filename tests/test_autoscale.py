@@ -0,0 +1,103 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+import boto3
+from moto import mock_aws
+
+import cli
+
+RESOURCE_ID = "endpoint/cheese-endpoint/variant/AllTraffic"
+
+
+@mock_aws
+class AutoscaleTest(unittest.TestCase):
+    def setUp(self):
+        # autoscale() reads and updates endpoint_config.json in the cwd
+        self.workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.workdir)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(self.workdir)
+        with open("endpoint_config.json", "w") as f:
+            json.dump({"endpoint_name": "cheese-endpoint", "mode": "realtime"}, f)
+        self.client = boto3.client("application-autoscaling", region_name=cli.AWS_REGION)
+
+    def autoscale(self, **kwargs):
+        with redirect_stdout(io.StringIO()):
+            cli.autoscale(**kwargs)
+
+    def scalable_targets(self):
+        return self.client.describe_scalable_targets(ServiceNamespace="sagemaker")[
+            "ScalableTargets"
+        ]
+
+    def scaling_policies(self):
+        return self.client.describe_scaling_policies(ServiceNamespace="sagemaker")[
+            "ScalingPolicies"
+        ]
+
+    def test_registers_target_and_policy(self):
+        self.autoscale(min_capacity=1, max_capacity=4, target_invocations=200)
+
+        [target] = self.scalable_targets()
+        self.assertEqual(target["ResourceId"], RESOURCE_ID)
+        self.assertEqual(target["ScalableDimension"], "sagemaker:variant:DesiredInstanceCount")
+        self.assertEqual((target["MinCapacity"], target["MaxCapacity"]), (1, 4))
+
+        [policy] = self.scaling_policies()
+        self.assertEqual(policy["ResourceId"], RESOURCE_ID)
+        self.assertEqual(policy["PolicyType"], "TargetTrackingScaling")
+        config = policy["TargetTrackingScalingPolicyConfiguration"]
+        self.assertEqual(config["TargetValue"], 200.0)
+        self.assertEqual(
+            config["PredefinedMetricSpecification"]["PredefinedMetricType"],
+            "SageMakerVariantInvocationsPerInstance",
+        )
+
+        with open("endpoint_config.json") as f:
+            self.assertEqual(json.load(f)["autoscaling"]["max_capacity"], 4)
+
+    def test_second_run_updates_in_place(self):
+        self.autoscale(min_capacity=1, max_capacity=4, target_invocations=200)
+        self.autoscale(min_capacity=2, max_capacity=8, target_invocations=50)
+
+        [target] = self.scalable_targets()
+        self.assertEqual((target["MinCapacity"], target["MaxCapacity"]), (2, 8))
+        [policy] = self.scaling_policies()
+        self.assertEqual(
+            policy["TargetTrackingScalingPolicyConfiguration"]["TargetValue"], 50.0
+        )
+
+    def test_serverless_endpoint_is_left_alone(self):
+        with open("endpoint_config.json", "w") as f:
+            json.dump({"endpoint_name": "cheese-endpoint", "mode": "serverless"}, f)
+        self.autoscale(min_capacity=1, max_capacity=4)
+        self.assertEqual(self.scalable_targets(), [])
+
+    def test_save_and_restore_around_removal(self):
+        # What update() does around a change of instance type
+        self.autoscale(min_capacity=2, max_capacity=6, target_invocations=150)
+        with redirect_stdout(io.StringIO()):
+            saved = cli.save_autoscaling("cheese-endpoint")
+            cli.remove_autoscaling("cheese-endpoint")
+            self.assertEqual(self.scalable_targets(), [])
+            cli.restore_autoscaling(saved)
+
+        [target] = self.scalable_targets()
+        self.assertEqual((target["MinCapacity"], target["MaxCapacity"]), (2, 6))
+        [policy] = self.scaling_policies()
+        self.assertEqual(policy["PolicyName"], "cheese-endpoint-invocations-per-instance")
+        self.assertEqual(
+            policy["TargetTrackingScalingPolicyConfiguration"]["TargetValue"], 150.0
+        )
+
+    def test_save_without_autoscaling(self):
+        self.assertIsNone(cli.save_autoscaling("cheese-endpoint"))
+
+
+if __name__ == "__main__":
+    unittest.main()
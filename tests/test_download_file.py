@@ -0,0 +1,131 @@
+import hashlib
+import http.server
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+
+from cli import download_file
+
+
+class RangeHandler(http.server.BaseHTTPRequestHandler):
+    # Serves server.content at any path with Range, ETag and If-Range support
+    def log_message(self, *args):
+        pass
+
+    def send_headers(self, status, length, content_range=None):
+        self.send_response(status)
+        self.send_header("Content-Length", str(length))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", self.server.etag)
+        if content_range:
+            self.send_header("Content-Range", content_range)
+        self.end_headers()
+
+    def do_HEAD(self):
+        self.send_headers(200, len(self.server.content))
+
+    def do_GET(self):
+        content = self.server.content
+        self.server.requests.append(self.headers.get("Range"))
+        range_header = self.headers.get("Range")
+        if_range = self.headers.get("If-Range")
+        if range_header and (if_range is None or if_range == self.server.etag):
+            start, end = range_header[len("bytes=") :].split("-")
+            start, end = int(start), int(end)
+            self.send_headers(
+                206, end - start + 1, f"bytes {start}-{end}/{len(content)}"
+            )
+            self.wfile.write(content[start : end + 1])
+        else:
+            self.send_headers(200, len(content))
+            self.wfile.write(content)
+
+
+class DownloadFileTest(unittest.TestCase):
+    def setUp(self):
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+        self.server.content = b"version one " * 1000
+        self.server.etag = '"v1"'
+        self.server.requests = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/model.bin"
+        self.base_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base_path)
+        self.part_path = os.path.join(self.base_path, "model.bin.part")
+
+    def write_partial(self, content, etag):
+        # Leave the .part and .part.json of a download interrupted halfway
+        # through its only segment
+        half = len(content) // 2
+        with open(self.part_path, "wb") as f:
+            f.write(content[:half] + b"\0" * (len(content) - half))
+        with open(self.part_path + ".json", "w") as f:
+            json.dump(
+                {
+                    "url": self.url,
+                    "size": len(content),
+                    "validator": etag,
+                    "segments": [[0, len(content) - 1, half]],
+                },
+                f,
+            )
+        return half
+
+    def download(self, **kwargs):
+        with redirect_stdout(io.StringIO()) as out:
+            digest = download_file(
+                self.url, base_path=self.base_path, num_workers=1, **kwargs
+            )
+        with open(os.path.join(self.base_path, "model.bin"), "rb") as f:
+            return digest, f.read(), out.getvalue()
+
+    def test_returns_sha256_and_checks_it(self):
+        expected = hashlib.sha256(self.server.content).hexdigest()
+        digest, data, _ = self.download(sha256=expected)
+        self.assertEqual(data, self.server.content)
+        self.assertEqual(digest, expected)
+
+        with self.assertRaises(RuntimeError):
+            with redirect_stdout(io.StringIO()):
+                download_file(self.url, base_path=self.base_path, sha256="0" * 64)
+        self.assertFalse(os.path.exists(self.part_path))
+
+    def test_resumes_when_validator_unchanged(self):
+        half = self.write_partial(self.server.content, '"v1"')
+        _, data, out = self.download()
+        self.assertEqual(data, self.server.content)
+        self.assertIn("Resuming", out)
+        self.assertEqual(self.server.requests, [f"bytes={half}-{len(data) - 1}"])
+
+    def test_restarts_when_validator_changed(self):
+        # Same URL and size, different bytes
+        self.write_partial(b"version two " * 1000, '"v2"')
+        _, data, out = self.download()
+        self.assertEqual(data, self.server.content)
+        self.assertIn("restarting", out)
+        self.assertEqual(self.server.requests, [f"bytes=0-{len(data) - 1}"])
+
+    def test_refuses_file_changed_while_downloading(self):
+        # The HEAD saw v1, the range request finds v2 and gets a 200
+        self.write_partial(self.server.content, '"v1"')
+        handler_head = RangeHandler.do_HEAD
+
+        def head_then_change(handler):
+            handler_head(handler)
+            handler.server.etag = '"v2"'
+
+        with mock.patch.object(RangeHandler, "do_HEAD", head_then_change):
+            with self.assertRaises(RuntimeError):
+                self.download(max_retries=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import cli
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+
+
+class StubPredictor:
+    # Answers every request with make_response(number of instances)
+    endpoint_name = "stub"
+
+    def __init__(self, make_response):
+        self.make_response = make_response
+
+    def predict(self, payload):
+        return self.make_response(len(payload["instances"]))
+
+
+def read_rows(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+class ScoreTest(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.workdir)
+        self.output = os.path.join(self.workdir, "scores.jsonl")
+        self.num_images = len(list(cli.list_images(DATA_DIR)))
+
+    def score(self, make_response, **kwargs):
+        with mock.patch.object(
+            cli, "make_backend_predictor", return_value=StubPredictor(make_response)
+        ):
+            cli.score(
+                DATA_DIR,
+                self.output,
+                batch_size=3,
+                max_payload_bytes=10**9,
+                concurrency=1,
+                **kwargs,
+            )
+
+    def test_scores_every_image(self):
+        self.score(lambda n: {"predictions": [[0.1, 0.7, 0.1, 0.1]] * n})
+        rows = read_rows(self.output)
+        self.assertEqual(len(rows), self.num_images)
+        self.assertTrue(all(row["label"] == "gruyere" for row in rows))
+
+    def test_short_response_becomes_error_rows(self):
+        # Every batch comes back one prediction short, or without any
+        responses = iter([{"predictions": [[0.25] * 4]}, {"error": "boom"}])
+        self.score(lambda n: next(responses, {"predictions": [[0.25] * 4] * n}))
+        rows = read_rows(self.output)
+        self.assertEqual(len(rows), self.num_images)
+        self.assertTrue(all(row["error"] for row in rows[:6]))
+        self.assertTrue(all(row["error"] is None for row in rows[6:]))
+
+    def test_rerun_of_finished_output_scores_nothing_and_says_so(self):
+        self.score(lambda n: {"predictions": [[0.25] * 4] * n})
+        with mock.patch("builtins.print") as printed:
+            self.score(lambda n: self.fail("finished output was scored again"))
+        self.assertIn("already complete", printed.call_args_list[0].args[0])
+        self.assertEqual(len(read_rows(self.output)), self.num_images)
+
+        # --no-resume starts over
+        self.score(lambda n: {"predictions": [[0.25] * 4] * n}, resume=False)
+        self.assertEqual(len(read_rows(self.output)), self.num_images)
+
+    def interrupt_after(self, completed, last_key=None):
+        # Rewrite the checkpoint as if the run had crashed after the first
+        # completed rows
+        with open(self.output, "rb") as f:
+            lines = f.readlines()[:completed]
+        with open(self.output + ".checkpoint.json", "w") as f:
+            json.dump(
+                {
+                    "completed": completed,
+                    "last_key": last_key or json.loads(lines[-1])["key"],
+                    "offset": sum(len(line) for line in lines),
+                    "finished": False,
+                },
+                f,
+            )
+
+    def test_resume_scores_only_the_rest(self):
+        self.score(lambda n: {"predictions": [[0.7, 0.1, 0.1, 0.1]] * n})
+        self.interrupt_after(3)
+        self.score(lambda n: {"predictions": [[0.1, 0.7, 0.1, 0.1]] * n})
+        rows = read_rows(self.output)
+        self.assertEqual([row["key"] for row in rows], list(cli.list_images(DATA_DIR)))
+        self.assertTrue(all(row["label"] == "parmigiano" for row in rows[:3]))
+        self.assertTrue(all(row["label"] == "gruyere" for row in rows[3:]))
+
+    def test_resume_refuses_a_changed_listing(self):
+        self.score(lambda n: {"predictions": [[0.25] * 4] * n})
+        self.interrupt_after(3, last_key="gone.jpg")
+        with self.assertRaisesRegex(RuntimeError, "listing changed"):
+            self.score(lambda n: {"predictions": [[0.25] * 4] * n})
+
+    def test_serverless_endpoint_caps_batches(self):
+        # Each json image is estimated at about 3 MB, so only one fits
+        # under the serverless cap however large --max-payload-bytes is
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(self.workdir)
+        with open("endpoint_config.json", "w") as f:
+            json.dump({"endpoint_name": "cheese-endpoint", "mode": "serverless"}, f)
+        batch_sizes = []
+
+        def make_response(n):
+            batch_sizes.append(n)
+            return {"predictions": [[0.25] * 4] * n}
+
+        self.score(make_response)
+        self.assertEqual(batch_sizes, [1] * self.num_images)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+from cli import stream_extract_zip
+
+
+class NonSeekableBuffer:
+    # Write-only file object, so zipfile writes data descriptors the way it
+    # does for pipes and sockets
+    def __init__(self):
+        self.data = bytearray()
+
+    def write(self, data):
+        self.data.extend(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+
+def make_zip(entries):
+    # entries are (name, bytes) pairs, names ending in "/" are directories
+    buffer = NonSeekableBuffer()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, data in entries:
+            if name.endswith("/"):
+                zf.writestr(zipfile.ZipInfo(name), b"")
+            else:
+                zf.writestr(name, data)
+    return bytes(buffer.data)
+
+
+def chunked(data, size=7):
+    for i in range(0, len(data), size):
+        yield data[i : i + size]
+
+
+def extracted_files(base_path):
+    files = {}
+    for root, _, names in os.walk(base_path):
+        for name in names:
+            path = os.path.join(root, name)
+            with open(path, "rb") as f:
+                files[os.path.relpath(path, base_path).replace(os.sep, "/")] = f.read()
+    return files
+
+
+class StreamExtractZipTest(unittest.TestCase):
+    def extract(self, archive):
+        base_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, base_path)
+        stream_extract_zip(chunked(archive), base_path)
+        return base_path
+
+    def test_directory_entries_use_data_descriptors(self):
+        archive = make_zip([("model/", b""), ("model/a.txt", b"a")])
+        with zipfile.ZipFile(io.BytesIO(archive)) as zf:
+            self.assertTrue(zf.getinfo("model/").flag_bits & 0x08)
+
+    def test_directory_first(self):
+        base_path = self.extract(
+            make_zip([("model/", b""), ("model/a.txt", b"a" * 1000), ("b.txt", b"b")])
+        )
+        self.assertEqual(
+            extracted_files(base_path), {"model/a.txt": b"a" * 1000, "b.txt": b"b"}
+        )
+
+    def test_directory_in_the_middle(self):
+        base_path = self.extract(
+            make_zip(
+                [
+                    ("a.txt", b"a"),
+                    ("model/", b""),
+                    ("model/variables/", b""),
+                    ("model/variables/w.bin", bytes(range(256)) * 20),
+                    ("z.txt", b"z"),
+                ]
+            )
+        )
+        self.assertEqual(
+            sorted(extracted_files(base_path)), ["a.txt", "model/variables/w.bin", "z.txt"]
+        )
+        self.assertTrue(os.path.isdir(os.path.join(base_path, "model", "variables")))
+
+    def test_truncated_stream_raises(self):
+        archive = make_zip([("model/", b""), ("model/a.txt", b"a"), ("b.txt", b"b")])
+        central_directory = archive.find(b"PK\x01\x02")
+        # Cut right after the last member: nothing is missing from the
+        # members themselves, but the archive never reaches its directory
+        with self.assertRaises(RuntimeError):
+            self.extract(archive[:central_directory] + b"\x00" * 8)
+
+    def test_truncated_stored_member_raises(self):
+        # Written to a seekable buffer so the stored member's sizes are in
+        # its local header, which is what lets it be streamed
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as zf:
+            zf.writestr("model/w.bin", bytes(range(256)) * 20)
+        archive = buffer.getvalue()
+        data_start = archive.find(b"model/w.bin") + len("model/w.bin")
+        with self.assertRaisesRegex(RuntimeError, "Truncated zip member"):
+            self.extract(archive[: data_start + 1000])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+import cli
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+
+
+class StubRunner:
+    # Writes make_output(index of the input) as the <key>.out of each input,
+    # or no output when it returns None, like a job with failed records
+    def __init__(self, make_output):
+        self.make_output = make_output
+
+    def run(self, input_prefix, output_prefix):
+        for index, key in enumerate(cli.list_images(input_prefix)):
+            output = self.make_output(index)
+            if output is None:
+                continue
+            output_key = cli.transform_output_key(key, input_prefix, output_prefix)
+            os.makedirs(os.path.dirname(output_key), exist_ok=True)
+            with open(output_key, "w") as f:
+                json.dump(output, f)
+
+
+class TransformTest(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.workdir)
+        self.output = os.path.join(self.workdir, "scores.jsonl")
+        self.keys = list(cli.list_images(DATA_DIR))
+
+    def transform(self, make_output):
+        with redirect_stdout(io.StringIO()):
+            cli.transform(
+                DATA_DIR,
+                self.output,
+                output_prefix=os.path.join(self.workdir, "transform-output"),
+                runner=StubRunner(make_output),
+            )
+        with open(self.output) as f:
+            return [json.loads(line) for line in f]
+
+    def test_joins_outputs_to_input_keys(self):
+        # Alternate between brie and parmigiano so a shuffled join shows
+        brie, parmigiano = [0.1, 0.1, 0.7, 0.1], [0.7, 0.1, 0.1, 0.1]
+        rows = self.transform(
+            lambda index: {"predictions": [parmigiano if index % 2 else brie]}
+        )
+        self.assertEqual([row["key"] for row in rows], self.keys)
+        self.assertEqual(
+            [row["label"] for row in rows],
+            ["parmigiano" if index % 2 else "brie" for index in range(len(self.keys))],
+        )
+        self.assertTrue(all(row["error"] is None for row in rows))
+
+    def test_bad_outputs_become_error_rows(self):
+        # A multi-record output, an empty one and a missing one
+        outputs = {
+            0: {"predictions": [[0.25] * 4] * 3},
+            1: {"predictions": []},
+            2: None,
+        }
+        rows = self.transform(
+            lambda index: outputs.get(index, {"predictions": [[0.1, 0.7, 0.1, 0.1]]})
+        )
+        self.assertEqual(len(rows), len(self.keys))
+        for row in rows[:3]:
+            self.assertIsNone(row["label"])
+            self.assertIsNotNone(row["error"])
+        self.assertIn("output had 3", rows[0]["error"])
+        self.assertTrue(all(row["label"] == "gruyere" for row in rows[3:]))
+
+
+if __name__ == "__main__":
+    unittest.main()